@@ -0,0 +1,220 @@
+"""
+Lectura por bloques de tablas de abundancia
+-------------------------------------------
+Lee tablas con el formato de `data/abundance_data.csv` (una columna por
+especie seguida de station, depth, lat y lon) sin cargarlas completas en
+pandas: el archivo se recorre en bloques de filas con tipos fijos (float32
+para las abundancias, categoría para la estación) y se entregan lotes por
+estación o por profundidad listos para `beta_diversity` y para la
+interpolación espacial (p. ej. `interpolate_data(batch.lon, batch.lat,
+batch.shannon(), ...)` con un lote por profundidad).
+
+- `iter_station_batches`: las filas de una estación suelen estar contiguas
+  (una fila por profundidad), así que cada lote se emite en cuanto cambia la
+  estación. Si una estación reaparece más adelante en el archivo se emite
+  otro lote con la misma clave.
+- `iter_depth_batches`: cada profundidad está repartida por todo el archivo,
+  así que en una primera pasada las filas se vuelcan por profundidad a
+  archivos binarios en disco y luego cada lote se entrega como memory-map.
+
+Uso:
+    python scripts/abundance_io.py [data/abundance_data.csv]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from beta_diversity import PresenceMatrix
+
+# Columnas de metadatos de las tablas de abundancia; el resto son especies
+METADATA_COLUMNS = ('station', 'depth', 'lat', 'lon')
+
+# Filas por bloque de lectura
+CHUNK_SIZE = 50_000
+
+class AbundanceBatch(namedtuple('AbundanceBatch',
+                                ['key', 'abundances', 'species', 'station', 'depth', 'lat', 'lon'])):
+    """
+    Lote de muestras: `abundances` es una matriz muestras x especies float32 y
+    `station`, `depth`, `lat`, `lon` son arreglos por muestra (`station` es
+    categórico en los lotes por profundidad). `key` es la estación o la
+    profundidad que define el lote.
+    """
+    __slots__ = ()
+
+    def presence_matrix(self, sites=None):
+        """
+        Presencia/ausencia del lote empaquetada en bits (ver `beta_diversity`).
+        """
+        return PresenceMatrix.from_dense(self.abundances > 0, sites=sites)
+
+    def shannon(self):
+        """
+        Índice de Shannon (H') de cada muestra del lote.
+        """
+        return shannon_diversity(self.abundances)
+
+def shannon_diversity(abundances):
+    """
+    Índice de Shannon H' = -Σ p ln p de cada fila de una matriz de abundancias.
+    Las muestras vacías tienen H' = 0.
+    """
+    abundances = np.asarray(abundances, dtype=float)
+    totals = abundances.sum(axis=-1, keepdims=True)
+    p = np.divide(abundances, totals, out=np.zeros_like(abundances), where=totals > 0)
+    log_p = np.log(p, out=np.zeros_like(p), where=p > 0)
+    return -(p * log_p).sum(axis=-1)
+
+def read_header(path):
+    """
+    Devuelve (especies, columnas de metadatos) según el encabezado del archivo.
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    species = [column for column in columns if column not in METADATA_COLUMNS]
+    metadata = [column for column in columns if column in METADATA_COLUMNS]
+    return species, metadata
+
+def column_dtypes(species):
+    """
+    Tipos de lectura: abundancias float32, estación categórica, profundidad
+    float32 y coordenadas float64 (la interpolación las necesita en doble
+    precisión).
+    """
+    dtypes = {name: np.float32 for name in species}
+    dtypes.update({'station': 'category', 'depth': np.float32,
+                   'lat': np.float64, 'lon': np.float64})
+    return dtypes
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Recorre el archivo en DataFrames de hasta `chunk_size` filas con tipos fijos.
+    """
+    species, _ = read_header(path)
+    yield from pd.read_csv(path, dtype=column_dtypes(species), chunksize=chunk_size)
+
+def _split_chunk(chunk, species):
+    return (chunk[species].to_numpy(dtype=np.float32),
+            chunk['station'].astype(str).to_numpy(),
+            chunk['depth'].to_numpy(),
+            chunk['lat'].to_numpy(),
+            chunk['lon'].to_numpy())
+
+def iter_station_batches(path, chunk_size=CHUNK_SIZE):
+    """
+    Entrega un `AbundanceBatch` por cada tramo contiguo de filas de la misma
+    estación. Sólo se mantiene en memoria un bloque y el tramo en curso.
+    """
+    species, _ = read_header(path)
+    pending = None
+    for chunk in iter_chunks(path, chunk_size):
+        abundances, station, depth, lat, lon = _split_chunk(chunk, species)
+        # Límites de los tramos de estación dentro del bloque
+        starts = np.flatnonzero(np.r_[True, station[1:] != station[:-1]])
+        stops = np.r_[starts[1:], len(station)]
+        for start, stop in zip(starts, stops):
+            part = (abundances[start:stop], station[start:stop], depth[start:stop],
+                    lat[start:stop], lon[start:stop])
+            if pending is not None and pending[1][0] == station[start]:
+                # El tramo continúa desde el bloque anterior
+                pending = tuple(np.concatenate([a, b]) for a, b in zip(pending, part))
+                continue
+            if pending is not None:
+                yield AbundanceBatch(pending[1][0], pending[0], species, *pending[1:])
+            pending = part
+    if pending is not None:
+        yield AbundanceBatch(pending[1][0], pending[0], species, *pending[1:])
+
+def iter_depth_batches(path, chunk_size=CHUNK_SIZE, spill_dir=None):
+    """
+    Entrega un `AbundanceBatch` por profundidad (en orden creciente).
+
+    Las filas se vuelcan por profundidad a archivos binarios en `spill_dir`
+    (por defecto un directorio temporal que se borra al terminar) y cada lote
+    se entrega como memory-map, de modo que ni el archivo ni una profundidad
+    completa tienen que caber en memoria. Los lotes sólo son válidos hasta
+    pedir el siguiente si se usa el directorio temporal.
+
+    Si `path` es un directorio se interpreta como un dataset de
+    `columnar_storage` y cada profundidad se lee directamente de su partición.
+    """
+    if os.path.isdir(path):
+        from columnar_storage import iter_depth_batches as iter_dataset_depths
+        yield from iter_dataset_depths(path)
+        return
+
+    species, _ = read_header(path)
+    cleanup = spill_dir is None
+    spill_dir = spill_dir or tempfile.mkdtemp(prefix='abundance_')
+    os.makedirs(spill_dir, exist_ok=True)
+
+    station_codes = {}
+    counts = {}
+    # Archivos de cada profundidad: se identifican por un índice (dos
+    # profundidades continuas cercanas podrían dar el mismo nombre con :g)
+    prefixes = {}
+    try:
+        for chunk in iter_chunks(path, chunk_size):
+            abundances, station, depth, lat, lon = _split_chunk(chunk, species)
+            codes = np.array([station_codes.setdefault(s, len(station_codes)) for s in station],
+                             dtype=np.int32)
+            for value in np.unique(depth):
+                rows = depth == value
+                # Los archivos se abren sólo mientras se escribe el bloque: con
+                # muchas profundidades distintas no se acumulan descriptores
+                # abiertos. La primera escritura trunca (por si `spill_dir`
+                # tenía archivos de otra ejecución) y las siguientes añaden
+                if value not in prefixes:
+                    prefixes[value] = os.path.join(spill_dir, f'depth_{len(prefixes)}')
+                    counts[value] = 0
+                mode = 'ab' if counts[value] else 'wb'
+                for name, values in (('abundances', abundances), ('station', codes),
+                                     ('lat', lat), ('lon', lon)):
+                    with open(f'{prefixes[value]}.{name}', mode) as f:
+                        f.write(values[rows].tobytes())
+                counts[value] += int(rows.sum())
+
+        categories = list(station_codes)
+        for value in sorted(prefixes):
+            n_rows = counts[value]
+            prefix = prefixes[value]
+            abundances = np.memmap(f'{prefix}.abundances', dtype=np.float32, mode='r',
+                                   shape=(n_rows, len(species)))
+            station = pd.Categorical.from_codes(np.fromfile(f'{prefix}.station', dtype=np.int32),
+                                                categories=categories)
+            yield AbundanceBatch(value, abundances, species, station,
+                                 np.full(n_rows, value, dtype=np.float32),
+                                 np.fromfile(f'{prefix}.lat', dtype=np.float64),
+                                 np.fromfile(f'{prefix}.lon', dtype=np.float64))
+    finally:
+        if cleanup:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+def read_abundance_table(path='data/abundance_data.csv'):
+    """
+    Lee una tabla completa (sólo para archivos pequeños) y devuelve (matriz
+    muestras x especies float32, DataFrame de metadatos, lista de especies).
+    """
+    species, metadata = read_header(path)
+    table = pd.read_csv(path, dtype=column_dtypes(species))
+    return table[species].to_numpy(dtype=np.float32), table[metadata], species
+
+if __name__ == "__main__":
+    from beta_diversity import beta_indices
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/abundance_data.csv'
+
+    print("Por estación:")
+    for batch in iter_station_batches(path):
+        print(f"  {batch.key}: {len(batch.depth)} muestras, H' medio {batch.shannon().mean():.2f}")
+
+    print("Por profundidad:")
+    for batch in iter_depth_batches(path):
+        jaccard = beta_indices(batch.presence_matrix())['jaccard']
+        print(f"  {batch.key:g} m: {len(batch.station)} estaciones, H' medio {batch.shannon().mean():.2f}, "
+              f"disimilitud de Jaccard media {jaccard.mean():.2f}")
@@ -0,0 +1,120 @@
+"""
+Benchmark de los motores RBF de interpolación
+---------------------------------------------
+Mide el tiempo y la memoria máxima del paso RBF de `interpolate_data`
+(ajuste + evaluación en la grilla temporal de 500x500) en función del número
+de estaciones, para el Rbf denso original y para `RBFInterpolator` con
+vecindarios locales.
+
+Además compara el camino float32 de `interpolate_layers` con el de float64:
+el índice de Shannon está acotado a [0.5, 4.0], así que se exige que la
+diferencia máxima sea menor que FLOAT32_TOLERANCE (1e-5; en la práctica es
+del orden de 1e-6).
+
+Uso:
+    python scripts/benchmark_interpolation.py
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from rbf_interpolation import build_rbf
+from zooplankton_spatial_analysis import get_grid, interpolate_layers
+
+# Misma región que zooplankton_spatial_analysis (Bahía de Valparaíso)
+lon_min, lon_max = -71.7, -71.45
+lat_min, lat_max = -33.1, -32.9
+
+STATION_COUNTS = [40, 250, 1000, 3000]
+GRID_DENSITY = 500
+NEIGHBORS = 50
+
+# El Rbf denso evalúa una matriz (puntos de grilla x estaciones) completa:
+# por encima de este número de estaciones ya no cabe en memoria razonable
+MAX_DENSE_STATIONS = 250
+
+# Diferencia máxima admitida entre los caminos float32 y float64 (unidades de H')
+FLOAT32_TOLERANCE = 1e-5
+DTYPE_LAYERS = 5
+
+CONFIGURATIONS = [
+    ('rbf', None),
+    ('interpolator', None),
+    ('interpolator', NEIGHBORS),
+]
+
+def synthetic_stations(n_stations, seed=0):
+    """
+    Genera estaciones aleatorias en la región con un campo de diversidad suave.
+    """
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(lon_min, lon_max, n_stations)
+    lat = rng.uniform(lat_min, lat_max, n_stations)
+    values = 2.0 + np.sin(lon * 20 + lat * 15) + rng.normal(0, 0.2, n_stations)
+    return lon, lat, np.clip(values, 0.5, 4.0)
+
+def measure(n_stations, backend, neighbors):
+    """
+    Devuelve (segundos, MB máximos) del ajuste y evaluación RBF.
+    """
+    lon, lat, values = synthetic_stations(n_stations)
+    grid_lon, grid_lat = np.meshgrid(np.linspace(lon_min, lon_max, GRID_DENSITY),
+                                     np.linspace(lat_min, lat_max, GRID_DENSITY))
+    tracemalloc.start()
+    start = time.perf_counter()
+    rbf = build_rbf(lon, lat, values, epsilon=0.005, smooth=0.1,
+                    backend=backend, neighbors=neighbors)
+    rbf(grid_lon, grid_lat)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+def run_benchmark(station_counts=STATION_COUNTS):
+    """
+    Ejecuta todas las configuraciones y entrega una fila de resultados por medición.
+    """
+    for n_stations in station_counts:
+        for backend, neighbors in CONFIGURATIONS:
+            label = backend if neighbors is None else f'{backend} (k={neighbors})'
+            if backend == 'rbf' and n_stations > MAX_DENSE_STATIONS:
+                yield n_stations, label, None, None
+                continue
+            elapsed, peak_mb = measure(n_stations, backend, neighbors)
+            yield n_stations, label, elapsed, peak_mb
+
+def dtype_accuracy(n_stations=40, n_layers=DTYPE_LAYERS):
+    """
+    Interpola `n_layers` capas sintéticas en float64 y en float32 sobre la
+    grilla del análisis y devuelve, por tipo, (segundos, MB del resultado) y
+    la diferencia máxima absoluta entre ambos.
+    """
+    lon, lat, values = synthetic_stations(n_stations)
+    layers = np.column_stack([values + 0.1 * layer for layer in range(n_layers)])
+    results = {}
+    for dtype in (np.float64, np.float32):
+        start = time.perf_counter()
+        cube = interpolate_layers(lon, lat, layers, *get_grid(), dtype=dtype)
+        results[np.dtype(dtype).name] = (cube, time.perf_counter() - start)
+    reference, candidate = results['float64'][0], results['float32'][0]
+    max_error = float(np.max(np.abs(candidate.astype(np.float64) - reference)))
+    timings = {name: (elapsed, cube.nbytes / 1e6) for name, (cube, elapsed) in results.items()}
+    return timings, max_error
+
+if __name__ == "__main__":
+    print(f"Grilla de evaluación: {GRID_DENSITY}x{GRID_DENSITY}")
+    print(f"{'Estaciones':>10}  {'Motor':<22} {'Tiempo (s)':>10}  {'Memoria máx. (MB)':>17}")
+    for n_stations, label, elapsed, peak_mb in run_benchmark():
+        if elapsed is None:
+            print(f"{n_stations:>10}  {label:<22} {'omitido':>10}  {'-':>17}")
+        else:
+            print(f"{n_stations:>10}  {label:<22} {elapsed:>10.2f}  {peak_mb:>17.1f}", flush=True)
+
+    timings, max_error = dtype_accuracy()
+    print(f"\nfloat32 frente a float64 ({DTYPE_LAYERS} capas en la grilla del análisis)")
+    for name, (elapsed, size_mb) in timings.items():
+        print(f"  {name:<8} {elapsed:>8.2f} s  {size_mb:>8.1f} MB")
+    status = 'OK' if max_error < FLOAT32_TOLERANCE else 'FUERA DE TOLERANCIA'
+    print(f"  Diferencia máxima: {max_error:.2e} (tolerancia {FLOAT32_TOLERANCE:.0e}) {status}")
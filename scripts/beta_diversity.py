@@ -0,0 +1,193 @@
+"""
+Motor de diversidad beta por pares de sitios
+--------------------------------------------
+Calcula los índices de Whittaker, Jaccard y Sørensen entre todos los pares de
+sitios a partir de una matriz de presencia/ausencia sitios x especies, como
+disimilitudes: Whittaker, 1 - Jaccard y 1 - Sørensen (0 = comunidades
+iguales). `similarities` devuelve Jaccard y Sørensen como similitudes, la
+forma en que se grafican.
+
+Para cada par sólo se necesitan la riqueza de cada sitio (a, b) y el número de
+especies compartidas (j). Las riquezas son sumas por fila y todas las
+especies compartidas salen de un único producto de matrices P @ P.T, que
+además se hace por lotes para varias profundidades a la vez (arreglos
+profundidades x sitios x especies). Los índices se devuelven como arreglos
+condensados en el mismo orden de pares que `scipy.spatial.distance.pdist`
+((0, 1), (0, 2), ..., (1, 2), ...), de modo que `squareform` los convierte en
+matrices cuadradas.
+
+Para tablas de OTUs muy anchas (eDNA, ~10⁵ taxones) `PresenceMatrix` guarda
+cada fila como bits empaquetados (1 bit por especie en lugar de 8 bytes de un
+int64) y obtiene riquezas y especies compartidas con AND bit a bit y conteo
+de bits; `beta_indices` acepta indistintamente una matriz densa o una
+`PresenceMatrix`.
+
+Cuando un denominador es cero (par de sitios sin especies) las tres
+disimilitudes valen 0, igual que en `dissimilarity` (y similitud 1).
+"""
+
+import numpy as np
+
+BETA_INDICES = ('whittaker', 'jaccard', 'sorensen')
+
+# Conteo de bits: np.bitwise_count (NumPy >= 2.0) o una tabla de 256 entradas
+if hasattr(np, 'bitwise_count'):
+    def _popcount_sum(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount_sum(words):
+        as_bytes = words.view(np.uint8).reshape(words.shape[:-1] + (-1,))
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int64)
+
+class PresenceMatrix:
+    """
+    Matriz de presencia/ausencia (..., sitios, especies) empaquetada en bits.
+
+    Cada fila se guarda como palabras de 64 bits (`np.packbits` rellenado a
+    múltiplos de 64 especies), por lo que ocupa especies / 8 bytes. Las
+    dimensiones iniciales opcionales (p. ej. profundidad) permiten calcular
+    varios grupos de sitios en un solo lote. `sites` son las etiquetas de los
+    sitios (opcional).
+    """
+    def __init__(self, words, n_species, sites=None):
+        self.words = words
+        self.n_species = n_species
+        self.sites = None if sites is None else list(sites)
+    
+    @classmethod
+    def from_dense(cls, presence, sites=None):
+        """
+        Empaqueta una matriz densa (..., sitios, especies) de 0/1 o booleanos.
+        """
+        presence = np.asarray(presence) > 0
+        n_species = presence.shape[-1]
+        packed = np.packbits(presence, axis=-1)
+        padding = -packed.shape[-1] % 8
+        if padding:
+            packed = np.concatenate(
+                [packed, np.zeros(packed.shape[:-1] + (padding,), dtype=np.uint8)], axis=-1)
+        return cls(np.ascontiguousarray(packed).view(np.uint64), n_species, sites)
+    
+    @property
+    def shape(self):
+        return self.words.shape[:-1] + (self.n_species,)
+    
+    @property
+    def n_sites(self):
+        return self.words.shape[-2]
+    
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+    
+    def to_dense(self):
+        """
+        Devuelve la matriz booleana (..., sitios, especies).
+        """
+        as_bytes = self.words.view(np.uint8)
+        return np.unpackbits(as_bytes, axis=-1, count=self.n_species).astype(bool)
+    
+    def richness(self):
+        """
+        Número de especies presentes en cada sitio, forma (..., sitios).
+        """
+        return _popcount_sum(self.words)
+    
+    def shared_counts(self):
+        """
+        Especies compartidas por cada par de sitios en forma condensada
+        (..., pares). Se procesa un sitio contra los siguientes por vez, de
+        modo que la memoria de trabajo es de una fila de pares.
+        """
+        n_sites = self.n_sites
+        shared = np.empty(self.words.shape[:-2] + (n_sites * (n_sites - 1) // 2,), dtype=np.int64)
+        start = 0
+        for i in range(n_sites - 1):
+            block = self.words[..., i:i + 1, :] & self.words[..., i + 1:, :]
+            shared[..., start:start + n_sites - 1 - i] = _popcount_sum(block)
+            start += n_sites - 1 - i
+        return shared
+
+def shared_counts(presence):
+    """
+    Número de especies compartidas entre cada par de sitios.
+
+    `presence` es un arreglo (..., sitios, especies) de presencia/ausencia; el
+    resultado tiene forma (..., sitios, sitios) y en la diagonal está la
+    riqueza de cada sitio.
+    """
+    presence = np.asarray(presence) > 0
+    # El producto en punto flotante usa BLAS y es exacto mientras los conteos
+    # quepan en la mantisa (2**24 especies en float32)
+    dtype = np.float32 if presence.shape[-1] < 2**24 else np.float64
+    p = presence.astype(dtype)
+    return np.rint(p @ np.swapaxes(p, -1, -2)).astype(np.int64)
+
+def _safe_divide(numerator, denominator):
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    return np.divide(numerator, denominator, out=out, where=denominator > 0)
+
+def beta_indices(presence):
+    """
+    Índices de diversidad beta entre todos los pares de sitios.
+
+    `presence` es un arreglo (..., sitios, especies) o una `PresenceMatrix`;
+    devuelve un diccionario {índice: arreglo (..., pares)} con las
+    disimilitudes de `BETA_INDICES` en forma condensada (la de `pdist`).
+    """
+    if isinstance(presence, PresenceMatrix):
+        rows, cols = np.triu_indices(presence.n_sites, k=1)
+        richness = presence.richness()
+        shared = presence.shared_counts()
+    else:
+        presence = np.asarray(presence) > 0
+        rows, cols = np.triu_indices(presence.shape[-2], k=1)
+        richness = presence.sum(axis=-1)
+        shared = shared_counts(presence)[..., rows, cols]
+    total = richness[..., rows] + richness[..., cols]
+    # Especies exclusivas de uno u otro sitio (b + c)
+    unshared = total - 2 * shared
+
+    return {
+        'whittaker': _safe_divide(unshared, total / 2),
+        'jaccard': _safe_divide(unshared, total - shared),
+        'sorensen': _safe_divide(unshared, total),
+    }
+
+def similarities(indices):
+    """
+    Copia de un resultado de `beta_indices` con Jaccard y Sørensen como
+    similitudes (1 - disimilitud); Whittaker no cambia.
+    """
+    return {name: 1 - values if name in ('jaccard', 'sorensen') else values
+            for name, values in indices.items()}
+
+def beta_indices_by_group(groups):
+    """
+    Aplica `beta_indices` a una lista de matrices sitios x especies (densas o
+    `PresenceMatrix`, p. ej. una por profundidad) y devuelve una lista de
+    diccionarios. Si todas las matrices tienen la misma forma se calculan en
+    un solo lote.
+    """
+    packed = all(isinstance(group, PresenceMatrix) for group in groups)
+    if not packed:
+        groups = [group.to_dense() if isinstance(group, PresenceMatrix) else np.asarray(group)
+                  for group in groups]
+    if len({group.shape for group in groups}) == 1:
+        if packed:
+            stacked = beta_indices(PresenceMatrix(np.stack([group.words for group in groups]),
+                                                  groups[0].n_species))
+        else:
+            stacked = beta_indices(np.stack(groups))
+        return [{name: values[k] for name, values in stacked.items()}
+                for k in range(len(groups))]
+    return [beta_indices(group) for group in groups]
+
+def pair_labels(sites):
+    """
+    Etiquetas 'sitio1-sitio2' de los pares en el orden condensado.
+    """
+    rows, cols = np.triu_indices(len(sites), k=1)
+    return [f'{sites[i]}-{sites[j]}' for i, j in zip(rows, cols)]
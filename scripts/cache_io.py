@@ -0,0 +1,56 @@
+"""
+Escritura atómica de cachés y archivos exportados
+-------------------------------------------------
+Cada archivo se escribe primero en una ruta temporal del mismo directorio
+(marcada con el pid del proceso) y luego se renombra con `os.replace`, de modo
+que otro proceso nunca lee un archivo a medias: ve el anterior o el completo.
+Los directorios de destino se crean si no existen.
+"""
+
+import contextlib
+import os
+
+import numpy as np
+
+def _tmp_path(path):
+    # Conserva la extensión: np.save y open_memmap añaden .npy si falta
+    root, ext = os.path.splitext(path)
+    return f'{root}.{os.getpid()}.tmp{ext}'
+
+def _prepare(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return _tmp_path(path)
+
+def save_npy_atomic(path, array):
+    """
+    Guarda `array` en `path` (.npy) con `np.save`.
+    """
+    tmp_path = _prepare(path)
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+@contextlib.contextmanager
+def open_npy_atomic(path, dtype, shape):
+    """
+    Abre un .npy nuevo como memory-map (`shape`, `dtype`) para llenarlo por
+    bloques sin tenerlo en memoria. Al salir del bloque `with` se vuelca y
+    reemplaza a `path`; si hay un error el temporal se borra.
+    """
+    tmp_path = _prepare(path)
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+    try:
+        yield out
+        out.flush()
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def write_bytes_atomic(path, data):
+    """
+    Escribe los bytes `data` en `path`.
+    """
+    tmp_path = _prepare(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
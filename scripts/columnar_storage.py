@@ -0,0 +1,184 @@
+"""
+Almacenamiento columnar de tablas de abundancia e índices
+---------------------------------------------------------
+Convierte las tablas CSV del proyecto (`data/abundance_data.csv`,
+`results/diversity_indices.csv`) a datasets Parquet o Arrow IPC particionados
+por profundidad (directorios `depth=50/...`, estilo Hive), y los lee
+seleccionando sólo las columnas y particiones necesarias.
+
+- La conversión lee el CSV como flujo de bloques de Arrow (`pyarrow.csv`), sin
+  pasar por pandas ni cargar el archivo completo.
+- Los filtros por profundidad descartan directorios completos sin abrirlos.
+  Dentro de cada profundidad las filas quedan en el orden del CSV (agrupadas
+  por estación) en grupos de filas pequeños, de modo que los filtros por
+  estación y el resto de las condiciones se evalúan con las estadísticas de
+  cada grupo de filas de Parquet (predicate pushdown).
+- También se puede particionar por profundidad y estación
+  (`partitioning=('depth', 'station')`), útil con pocas estaciones; con miles
+  de estaciones genera miles de archivos diminutos y la escritura y la
+  lectura se vuelven mucho más lentas.
+- `iter_depth_batches` entrega lotes `abundance_io.AbundanceBatch` por
+  profundidad leyendo sólo las especies pedidas, para los mapas por
+  profundidad y la diversidad beta.
+
+Uso:
+    python scripts/columnar_storage.py [formato]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+
+from abundance_io import AbundanceBatch, METADATA_COLUMNS, read_header
+
+FORMATS = ('parquet', 'ipc')
+PARTITION_COLUMNS = ('depth',)
+
+# Filas por grupo de Parquet: grupos pequeños afinan el filtrado por estación
+ROWS_PER_GROUP = 16_384
+
+# Tipos comunes de las columnas de partición
+PARTITION_TYPES = {'depth': pa.float32(), 'station': pa.string()}
+
+def _check_format(format):
+    if format not in FORMATS:
+        raise ValueError(f"Formato desconocido: {format!r} (opciones: {FORMATS})")
+
+def convert_csv(csv_path, root, format='parquet', partitioning=PARTITION_COLUMNS,
+                column_types=None, block_size=1 << 24):
+    """
+    Escribe el CSV `csv_path` como dataset en `root` particionado por las
+    columnas de `partitioning`. `column_types` ({columna: tipo de Arrow})
+    fija los tipos; las columnas de partición usan `PARTITION_TYPES`.
+    Devuelve `root`.
+    """
+    _check_format(format)
+    column_types = {**PARTITION_TYPES, **(column_types or {})}
+    reader = pcsv.open_csv(csv_path,
+                           read_options=pcsv.ReadOptions(block_size=block_size),
+                           convert_options=pcsv.ConvertOptions(column_types=column_types))
+    schema = pa.schema([reader.schema.field(name) for name in partitioning])
+    ds.write_dataset(reader, root, format=format,
+                     partitioning=ds.partitioning(schema, flavor='hive'),
+                     existing_data_behavior='delete_matching',
+                     max_partitions=1 << 16,
+                     max_rows_per_group=ROWS_PER_GROUP)
+    return root
+
+def convert_abundance_csv(csv_path, root, format='parquet'):
+    """
+    Convierte una tabla de abundancias guardando las especies como float32.
+    """
+    species, _ = read_header(csv_path)
+    return convert_csv(csv_path, root, format=format,
+                       column_types={name: pa.float32() for name in species})
+
+def _partition_columns(root):
+    # Columnas de partición según los directorios `columna=valor` anidados
+    columns = []
+    path = root
+    while True:
+        entries = sorted(entry for entry in os.listdir(path)
+                         if '=' in entry and os.path.isdir(os.path.join(path, entry)))
+        if not entries:
+            return tuple(columns)
+        columns.append(entries[0].split('=', 1)[0])
+        path = os.path.join(path, entries[0])
+
+def open_dataset(root, format='parquet', partitioning=None):
+    """
+    Abre un dataset particionado escrito por `convert_csv`. Las columnas de
+    partición (por defecto, las de los nombres de directorio) se leen con los
+    tipos de `PARTITION_TYPES`, no con los que Arrow adivinaría de cada
+    nombre: una profundidad 12.5 no convierte la columna en texto y un código
+    de estación numérico sigue siendo texto.
+    """
+    _check_format(format)
+    if partitioning is None:
+        partitioning = _partition_columns(root)
+    schema = pa.schema([(column, PARTITION_TYPES.get(column, pa.string())) for column in partitioning])
+    return ds.dataset(root, format=format, partitioning=ds.partitioning(schema, flavor='hive'))
+
+def build_filter(depths=None, stations=None, filter=None):
+    """
+    Expresión de filtro para profundidades, estaciones y una condición
+    adicional opcional (expresión de `pyarrow.dataset`).
+    """
+    expressions = [filter] if filter is not None else []
+    # Los valores se convierten al tipo de la columna (float32 / texto)
+    if depths is not None:
+        expressions.append(pc.field('depth').isin(pa.array(list(depths), type=PARTITION_TYPES['depth'])))
+    if stations is not None:
+        expressions.append(pc.field('station').isin(pa.array([str(s) for s in stations],
+                                                             type=PARTITION_TYPES['station'])))
+    if not expressions:
+        return None
+    expression = expressions[0]
+    for other in expressions[1:]:
+        expression = expression & other
+    return expression
+
+def read_table(root, columns=None, depths=None, stations=None, filter=None, format='parquet'):
+    """
+    Lee del dataset sólo `columns` de las profundidades y estaciones pedidas
+    y devuelve un DataFrame.
+    """
+    dataset = open_dataset(root, format)
+    table = dataset.to_table(columns=columns, filter=build_filter(depths, stations, filter))
+    return table.to_pandas()
+
+def partition_values(root, column='depth', format='parquet'):
+    """
+    Valores de una columna de partición en orden creciente (numérico para la
+    profundidad), leídos de los directorios sin abrir los archivos de datos.
+    """
+    dataset = open_dataset(root, format)
+    values = {ds.get_partition_keys(fragment.partition_expression).get(column)
+              for fragment in dataset.get_fragments()}
+    return sorted(value for value in values if value is not None)
+
+def iter_depth_batches(root, species=None, depths=None, format='parquet'):
+    """
+    Entrega un `AbundanceBatch` por profundidad (en orden creciente) leyendo
+    sólo las especies de `species` (por defecto todas) y los metadatos.
+    """
+    dataset = open_dataset(root, format)
+    if species is None:
+        species = [name for name in dataset.schema.names if name not in METADATA_COLUMNS]
+    columns = list(species) + ['station', 'lat', 'lon']
+
+    for depth in depths if depths is not None else partition_values(root, 'depth', format):
+        table = dataset.to_table(columns=columns, filter=build_filter(depths=[depth]))
+        abundances = np.column_stack([table[name].to_numpy().astype(np.float32, copy=False)
+                                      for name in species]) if species else \
+            np.empty((table.num_rows, 0), dtype=np.float32)
+        yield AbundanceBatch(depth, abundances, list(species),
+                             pd.Categorical(table['station'].to_numpy(zero_copy_only=False)),
+                             np.full(table.num_rows, depth, dtype=np.float32),
+                             table['lat'].to_numpy(), table['lon'].to_numpy())
+
+if __name__ == "__main__":
+    format = sys.argv[1] if len(sys.argv) > 1 else 'parquet'
+    output_dir = os.path.join('.cache', 'columnar', format)
+
+    abundance_root = convert_abundance_csv('data/abundance_data.csv',
+                                           os.path.join(output_dir, 'abundance_data'), format)
+    indices_root = convert_csv('results/diversity_indices.csv',
+                               os.path.join(output_dir, 'diversity_indices'), format)
+    print(f"Datasets escritos en {output_dir}")
+
+    # Sólo las columnas y profundidades necesarias para un mapa a 50 m
+    indices = read_table(indices_root, columns=['station', 'faith_pd', 'rao_q'],
+                         depths=[50], format=format)
+    print(indices.to_string(index=False))
+
+    for batch in iter_depth_batches(abundance_root, species=['Acartia tonsa', 'Calanus chilensis'],
+                                    depths=[0, 100], format=format):
+        print(f"{batch.key:g} m: {len(batch.station)} estaciones, "
+              f"{batch.abundances.shape[1]} especies leídas")
@@ -0,0 +1,124 @@
+"""
+Disimilitud entre muestras de abundancia
+----------------------------------------
+Calcula matrices de disimilitud entre todas las muestras (filas) de una tabla
+de abundancias con el formato de `data/abundance_data.csv`: una columna por
+especie y columnas de metadatos (estación, profundidad, posición); ver
+`abundance_io` para leerlas.
+
+Métricas disponibles (todas como disimilitud, 1 - similitud):
+
+- 'braycurtis': Bray-Curtis sobre las abundancias,
+- 'jaccard': Jaccard sobre presencia/ausencia (abundancia > 0),
+- 'sorensen': Sørensen sobre presencia/ausencia ('dice' en scipy).
+
+Los resultados son arreglos condensados de `scipy.spatial.distance.pdist`
+(cada par una sola vez, sin diagonal); `squareform` los convierte en matrices
+cuadradas. Para miles de muestras el cálculo puede hacerse por bloques de
+filas con `cdist` directamente sobre un arreglo en disco, y el resultado se
+guarda en `cache_dir` bajo una clave derivada de los datos y la métrica.
+
+Cuando un par no tiene especies (denominador cero) la disimilitud vale 0,
+igual que en `beta_diversity`.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+from scipy.spatial.distance import cdist, pdist
+
+from abundance_io import read_abundance_table
+from cache_io import open_npy_atomic
+
+# Directorio para matrices de disimilitud reutilizables entre ejecuciones
+cache_dir = os.path.join('.cache', 'dissimilarity')
+
+# Nombre de cada métrica en scipy y si se calcula sobre presencia/ausencia
+METRICS = {
+    'braycurtis': ('braycurtis', False),
+    'jaccard': ('jaccard', True),
+    'sorensen': ('dice', True),
+}
+
+def _prepare(abundances, metric):
+    if metric not in METRICS:
+        raise ValueError(f"Métrica desconocida: {metric!r} (opciones: {tuple(METRICS)})")
+    scipy_metric, binary = METRICS[metric]
+    abundances = np.asarray(abundances)
+    return (abundances > 0 if binary else abundances.astype(float)), scipy_metric
+
+def condensed_size(n_samples):
+    return n_samples * (n_samples - 1) // 2
+
+def compute_dissimilarity(abundances, metric='braycurtis', chunk_size=None, out=None):
+    """
+    Disimilitud condensada entre las filas de `abundances`.
+
+    Sin `chunk_size` se usa `pdist` de una vez. Con `chunk_size` se procesan
+    bloques de filas contra las filas siguientes con `cdist` y sólo se copia
+    el triángulo superior; `out` (p. ej. un memmap de tamaño n(n-1)/2) recibe
+    el resultado sin tener nunca la matriz cuadrada en memoria.
+    """
+    data, scipy_metric = _prepare(abundances, metric)
+    n_samples = len(data)
+    if out is None:
+        out = np.empty(condensed_size(n_samples))
+
+    if chunk_size is None:
+        out[:] = pdist(data, metric=scipy_metric)
+    else:
+        for start in range(0, n_samples - 1, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            block = cdist(data[start:stop], data[start:], metric=scipy_metric)
+            for row, i in enumerate(range(start, stop)):
+                # Los pares (i, j > i) son contiguos en la forma condensada
+                offset = n_samples * i - i * (i + 1) // 2
+                out[offset:offset + n_samples - 1 - i] = block[row, row + 1:]
+
+    # Pares sin especies en ninguna de las dos muestras (0/0)
+    np.nan_to_num(out, copy=False, nan=0.0)
+    return out
+
+def _dissimilarity_key(abundances, metric):
+    """
+    Clave de la caché: métrica, forma, tipo y contenido de la tabla.
+    """
+    abundances = np.ascontiguousarray(abundances)
+    digest = hashlib.sha1(repr((metric, abundances.shape, abundances.dtype.str)).encode())
+    digest.update(abundances.tobytes())
+    return digest.hexdigest()[:16]
+
+def dissimilarity(abundances, metric='braycurtis', chunk_size=None, use_cache=True):
+    """
+    Devuelve la disimilitud condensada de `compute_dissimilarity`.
+
+    Con `use_cache` el resultado se escribe en `cache_dir` (directamente en
+    disco cuando se usa `chunk_size`) y las llamadas siguientes con los mismos
+    datos y métrica lo abren como memory-map en lugar de recalcularlo.
+    """
+    if not use_cache:
+        return compute_dissimilarity(abundances, metric, chunk_size=chunk_size)
+
+    path = os.path.join(cache_dir, f'{metric}_{_dissimilarity_key(abundances, metric)}.npy')
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+
+    # Escritura atómica para que otro proceso nunca lea una matriz a medias
+    with open_npy_atomic(path, float, (condensed_size(len(abundances)),)) as out:
+        compute_dissimilarity(abundances, metric, chunk_size=chunk_size, out=out)
+    return np.load(path, mmap_mode='r')
+
+if __name__ == "__main__":
+    from scipy.spatial.distance import squareform
+
+    abundances, metadata, species = read_abundance_table()
+    labels = [f'{station}-{depth:g}m' for station, depth in zip(metadata['station'], metadata['depth'])]
+    print(f"{len(labels)} muestras x {len(species)} especies")
+
+    for metric in METRICS:
+        matrix = squareform(dissimilarity(abundances, metric))
+        np.fill_diagonal(matrix, np.nan)
+        i, j = np.unravel_index(np.nanargmax(matrix), matrix.shape)
+        print(f"{metric:<11} media {np.nanmean(matrix):.3f}  "
+              f"máxima {matrix[i, j]:.3f} ({labels[i]} / {labels[j]})")
@@ -0,0 +1,316 @@
+"""
+Exportación de datos de figuras para el sitio web
+-------------------------------------------------
+Escribe los datos que hay detrás de las figuras de `zooplankton_spatial_analysis`,
+`generate_beta_examples`, `generate_beta_diversity_plots` y
+`phylogenetic_diversity_workflow` como archivos compactos que el sitio dibuja
+en el navegador, en lugar de PNG de 300 dpi:
+
+- grillas: binario little-endian uint8/uint16 con escala y desplazamiento
+  por capa (valor = offset + entero x scale) y el máximo del tipo reservado
+  para celdas sin dato (tierra); el manifiesto da el orden de los ejes
+  (capa, lat, lon) y las coordenadas de filas y columnas,
+- tablas: JSON por columnas ({"columns": [...], "data": {columna: [...]}}),
+- otros datos (redes, matrices): JSON.
+
+Todo queda descrito en `manifest.json` (archivo, tipo, forma, escalas y hash
+del contenido de cada recurso). La exportación es incremental: cada grupo de
+recursos tiene una clave de sus entradas (código del script de la figura y
+de los módulos que importa, y formato); si no cambió y sus archivos existen,
+el grupo ni siquiera se calcula, y de los que se recalculan sólo se
+reescriben los archivos cuyo contenido cambió.
+
+Uso:
+    python scripts/export_figure_data.py [grupo ...] [--force]
+"""
+
+import ast
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from cache_io import write_bytes_atomic
+
+# Directorio de los recursos exportados (servidos por Next.js desde public/)
+output_dir = os.path.join('public', 'data', 'diversidad')
+manifest_name = 'manifest.json'
+
+# Cambiar al modificar la codificación: invalida todos los grupos
+FORMAT_VERSION = 2
+
+# Tipo de las grillas: uint8 alcanza para colorear un mapa
+GRID_DTYPE = 'uint8'
+
+# Cifras significativas de los números en JSON
+JSON_DIGITS = 6
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+
+# kind: 'grid', 'table' o 'json'; data: arreglo, DataFrame u objeto; meta:
+# metadatos adicionales para el manifiesto
+Asset = namedtuple('Asset', ['kind', 'data', 'meta'])
+
+def grid_asset(layers, layer_names, lon, lat, dtype=GRID_DTYPE):
+    """
+    Recurso de grilla a partir de capas (capas x lat x lon, NaN sin dato):
+    la fila i está en `lat[i]` y la columna j en `lon[j]`. El manifiesto
+    guarda ambos vectores, el orden de los ejes y `extent` =
+    [lon_min, lon_max, lat_min, lat_max].
+    """
+    layers = np.asarray(layers, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    if layers.shape[1:] != (len(lat), len(lon)):
+        raise ValueError(f"Las capas {layers.shape[1:]} no coinciden con lat x lon "
+                         f"({len(lat)}, {len(lon)})")
+    return Asset('grid', layers,
+                 dict(layers=list(layer_names), axes=['layer', 'lat', 'lon'],
+                      lon=lon.tolist(), lat=lat.tolist(),
+                      extent=[float(lon.min()), float(lon.max()), float(lat.min()), float(lat.max())],
+                      dtype=dtype))
+
+def table_asset(df):
+    return Asset('table', df, {})
+
+def json_asset(obj):
+    return Asset('json', obj, {})
+
+def quantize(layers, dtype=GRID_DTYPE):
+    """
+    Cuantiza cada capa a `dtype` con su propia escala y desplazamiento. El
+    máximo del tipo queda para NaN. Devuelve (enteros, escalas, offsets).
+    """
+    info = np.iinfo(dtype)
+    nodata = info.max
+    levels = nodata - 1
+    quantized = np.full(layers.shape, nodata, dtype=dtype)
+    scales, offsets = [], []
+    for layer, out in zip(layers, quantized):
+        valid = np.isfinite(layer)
+        low = float(layer[valid].min()) if valid.any() else 0.0
+        high = float(layer[valid].max()) if valid.any() else 0.0
+        scale = (high - low) / levels if high > low else 1.0
+        out[valid] = np.round((layer[valid] - low) / scale)
+        scales.append(scale)
+        offsets.append(low)
+    return quantized, scales, offsets
+
+def _json_value(value):
+    # Números de numpy a tipos de JSON, con JSON_DIGITS cifras significativas
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_json_value(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(f'{value:.{JSON_DIGITS}g}') if np.isfinite(value) else None
+    return value
+
+def _dumps(obj):
+    return json.dumps(_json_value(obj), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def encode_asset(name, asset):
+    """
+    Devuelve (nombre de archivo, bytes, metadatos del manifiesto) de un recurso.
+    """
+    if asset.kind == 'grid':
+        dtype = np.dtype(asset.meta['dtype']).newbyteorder('<')
+        quantized, scales, offsets = quantize(asset.data, dtype)
+        meta = dict(asset.meta, lon=_json_value(asset.meta['lon']), lat=_json_value(asset.meta['lat']),
+                    shape=list(quantized.shape), nodata=int(np.iinfo(dtype).max),
+                    layers=[dict(name=layer, scale=scale, offset=offset)
+                            for layer, scale, offset in zip(asset.meta['layers'], scales, offsets)])
+        return f'{name}.bin', quantized.tobytes(), meta
+    if asset.kind == 'table':
+        df = asset.data
+        data = {'columns': list(df.columns),
+                'data': {column: df[column].tolist() for column in df.columns}}
+        return f'{name}.json', _dumps(data), dict(asset.meta, rows=len(df))
+    return f'{name}.json', _dumps(asset.data), dict(asset.meta)
+
+# Constructores de cada grupo: importan los scripts sólo si hay que recalcular
+
+def zooplankton_spatial_assets():
+    import pandas as pd
+    import zooplankton_spatial_analysis as zsa
+
+    analysis = zsa.compute_analysis()
+    # get_grid usa meshgrid(lon, lat): filas = latitud (de lat_min a lat_max), columnas = longitud
+    lon_grid, lat_grid = zsa.get_grid()
+    stations = pd.DataFrame({'lon': analysis['lon_stations'], 'lat': analysis['lat_stations'],
+                             'distance_to_coast': analysis['distance_to_coast']})
+    for depth, values in analysis['diversity_by_depth'].items():
+        stations[f'diversity_{depth}m'] = values
+    return {
+        'zooplankton_diversity_grids': grid_asset(
+            analysis['diversity_cube'], [f'{depth}m' for depth in zsa.depths] + ['diferencia_0m_200m'],
+            lon_grid[0], lat_grid[:, 0]),
+        'zooplankton_stations': table_asset(stations),
+        'zooplankton_vertical_profile': table_asset(pd.DataFrame({
+            'depth': zsa.depths_profile, 'avg_diversity': analysis['avg_diversity']})),
+    }
+
+def beta_examples_assets():
+    import pandas as pd
+    from generate_beta_examples import generate_amp_comparison_data, generate_temporal_data
+
+    temporal = [generate_temporal_data(index).assign(index=index)
+                for index in ['whittaker', 'jaccard', 'sorensen']]
+    return {
+        'beta_diversity_amp': table_asset(generate_amp_comparison_data()),
+        'beta_diversity_temporal': table_asset(pd.concat(temporal, ignore_index=True)),
+    }
+
+def beta_diversity_plots_assets():
+    from generate_beta_diversity_plots import calculate_beta_indices, generate_synthetic_species_data
+
+    # El script no fija semilla; aquí sí, para que la exportación sea reproducible
+    np.random.seed(42)
+    return {
+        'beta_diversity_by_depth': table_asset(calculate_beta_indices(generate_synthetic_species_data())),
+    }
+
+def phylogenetic_diversity_assets():
+    from phylogenetic_diversity_workflow import ZooplanktonDiversityAnalysis
+
+    analysis = ZooplanktonDiversityAnalysis()
+    species = list(analysis.abundance_df.columns.drop('zone'))
+    G, pos = analysis.functional_network()
+    indices = analysis.phylogenetic_indices().merge(
+        analysis.functional_indices(), on='zone', suffixes=('_phylo', '_functional'))
+    return {
+        'taxonomic_diversity': json_asset(analysis.taxa),
+        'phylogenetic_distances': json_asset({'species': species,
+                                              'distances': analysis.phylo_distances}),
+        'functional_network': json_asset({
+            'nodes': [{'id': node, 'x': pos[node][0], 'y': pos[node][1]} for node in G.nodes],
+            'edges': [{'source': u, 'target': v, 'weight': w} for u, v, w in G.edges(data='weight')],
+        }),
+        'zone_dissimilarity': json_asset({'zones': analysis.zones,
+                                          'braycurtis': analysis.zone_dissimilarity()}),
+        'zone_abundances': table_asset(analysis.abundance_df),
+        'diversity_indices': table_asset(indices),
+    }
+
+def script_sources(*modules):
+    """
+    Archivos de los que dependen los módulos `modules` de `scripts_dir`: ellos
+    mismos y, recursivamente, los módulos de `scripts_dir` que importan (en
+    cualquier parte del archivo, también dentro de funciones). Los imports de
+    otros paquetes se ignoran. Devuelve las rutas ordenadas.
+    """
+    pending = list(modules)
+    found = set()
+    while pending:
+        path = os.path.join(scripts_dir, f'{pending.pop()}.py')
+        if path in found or not os.path.exists(path):
+            continue
+        found.add(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split('.')[0])
+    return sorted(found)
+
+# grupo -> (archivos de entrada, constructor de recursos); los archivos son el
+# script de cada figura y los módulos que importa
+EXPORTS = {
+    'zooplankton_spatial': (
+        script_sources('zooplankton_spatial_analysis'), zooplankton_spatial_assets),
+    'beta_examples': (
+        script_sources('generate_beta_examples'), beta_examples_assets),
+    'beta_diversity_plots': (
+        script_sources('generate_beta_diversity_plots'), beta_diversity_plots_assets),
+    'phylogenetic_diversity': (
+        script_sources('phylogenetic_diversity_workflow'), phylogenetic_diversity_assets),
+}
+
+def input_key(group, sources):
+    """
+    Clave de las entradas de un grupo: formato, tipo de grilla y contenido de
+    cada archivo del que depende.
+    """
+    digest = hashlib.sha1(repr((FORMAT_VERSION, GRID_DTYPE, JSON_DIGITS, group)).encode())
+    for path in sources:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+def _read_manifest(directory):
+    path = os.path.join(directory, manifest_name)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == FORMAT_VERSION:
+            return manifest
+    return {'version': FORMAT_VERSION, 'groups': {}, 'assets': {}}
+
+def export_all(directory=output_dir, groups=None, force=False):
+    """
+    Exporta los grupos pedidos (por defecto todos) en `directory`. Con
+    `force` recalcula aunque las entradas no hayan cambiado. Devuelve un dict
+    con las listas 'written', 'unchanged' (recursos) y 'skipped' (grupos).
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory)
+    report = {'written': [], 'unchanged': [], 'skipped': []}
+
+    for group in groups or EXPORTS:
+        sources, build = EXPORTS[group]
+        key = input_key(group, sources)
+        previous = manifest['groups'].get(group, {})
+        up_to_date = previous.get('key') == key and all(
+            name in manifest['assets']
+            and os.path.exists(os.path.join(directory, manifest['assets'][name]['file']))
+            for name in previous.get('assets', []))
+        if up_to_date and not force:
+            report['skipped'].append(group)
+            continue
+
+        assets = build()
+        # Recursos que el grupo ya no produce
+        for name in set(previous.get('assets', [])) - set(assets):
+            old = manifest['assets'].pop(name, None)
+            if old and os.path.exists(os.path.join(directory, old['file'])):
+                os.remove(os.path.join(directory, old['file']))
+
+        for name, asset in assets.items():
+            file_name, data, meta = encode_asset(name, asset)
+            sha1 = hashlib.sha1(data).hexdigest()
+            path = os.path.join(directory, file_name)
+            old = manifest['assets'].get(name, {})
+            if old.get('sha1') == sha1 and old.get('file') == file_name and os.path.exists(path):
+                report['unchanged'].append(name)
+            else:
+                write_bytes_atomic(path, data)
+                report['written'].append(name)
+            manifest['assets'][name] = dict(meta, file=file_name, kind=asset.kind, group=group,
+                                            sha1=sha1, bytes=len(data))
+        manifest['groups'][group] = {'key': key, 'assets': list(assets)}
+
+    if report['written'] or any(group not in report['skipped'] for group in groups or EXPORTS):
+        write_bytes_atomic(os.path.join(directory, manifest_name),
+                           json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8'))
+    return report
+
+if __name__ == "__main__":
+    force = '--force' in sys.argv
+    groups = [arg for arg in sys.argv[1:] if not arg.startswith('--')] or None
+
+    report = export_all(groups=groups, force=force)
+    for name in report['written']:
+        print(f"Recurso escrito: {name}")
+    if report['unchanged']:
+        print(f"Sin cambios: {', '.join(report['unchanged'])}")
+    if report['skipped']:
+        print(f"Grupos al día (no recalculados): {', '.join(report['skipped'])}")
@@ -0,0 +1,266 @@
+"""
+Similitud y diversidad funcional entre especies
+-----------------------------------------------
+Compara especies según tablas de rasgos mixtos como
+`ZooplanktonDiversityAnalysis.trait_data`: rasgos continuos (`Tamaño`) y
+categóricos (`Movilidad`, `Estrategia_alimentación`, `Reproducción`).
+
+La tabla se codifica una sola vez (`encode_traits`): los rasgos continuos se
+escalan a [0, 1] con su rango y los categóricos pasan a códigos enteros. La
+similitud entre dos especies es la de Gower, el promedio sobre rasgos de
+1 - |x_i - x_j| para los continuos escalados y de 1/0 (coincide o no) para
+los categóricos. Un rasgo continuo nunca coincide exactamente entre dos
+especies, así que compararlo por igualdad lo anularía.
+
+Todas las similitudes de un bloque de especies contra el resto salen de una
+operación vectorizada por rasgo; `similarity_edges` recorre los bloques y
+devuelve sólo los pares sobre un umbral como matriz dispersa, sin formar
+nunca la matriz especies x especies completa.
+
+Índices por muestra a partir de la distancia de Gower d = 1 - similitud
+(`functional_indices`):
+
+- Rao Q funcional (FD): Σ_ij a_i a_j d_ij con abundancias relativas a.
+- Dispersión funcional (FDis): distancia media ponderada de las especies al
+  centroide de la muestra. Con √d las especies forman una configuración
+  euclídea en la que |x_j - c|² = Σ_k a_k d_jk - Q/2, así que FDis sale de
+  los mismos productos a @ d que Q, sin coordenadas.
+- Riqueza funcional (FRic): volumen de la envolvente convexa de las especies
+  presentes en los primeros ejes de un PCoA de √d. Las coordenadas se
+  guardan en `cache_dir` bajo una clave de los rasgos.
+
+Las distancias se calculan por bloques de especies contra todas, de modo que
+todas las muestras se procesan en una pasada con memoria proporcional a
+bloque x especies. Para el PCoA de pools grandes la matriz se escribe una
+vez en disco (float32) y sólo se extraen los ejes pedidos con `eigsh`.
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, eigsh
+from scipy.spatial import ConvexHull, QhullError
+
+from cache_io import save_npy_atomic
+
+# Directorio para coordenadas PCoA reutilizables entre ejecuciones
+cache_dir = os.path.join('.cache', 'functional')
+
+# Ejes del PCoA usados para la riqueza funcional
+FRIC_AXES = 3
+
+# Especies por bloque de filas al comparar todas contra todas
+BLOCK_SIZE = 1024
+
+class TraitMatrix(namedtuple('TraitMatrix',
+                             ['species', 'numeric', 'codes', 'numeric_traits', 'categorical_traits'])):
+    """
+    Rasgos codificados: `numeric` es una matriz especies x rasgos continuos
+    escalada a [0, 1] y `codes` una matriz especies x rasgos categóricos de
+    códigos enteros.
+    """
+    __slots__ = ()
+
+    @property
+    def n_species(self):
+        return len(self.species)
+
+    @property
+    def n_traits(self):
+        return self.numeric.shape[1] + self.codes.shape[1]
+
+def encode_traits(trait_data, traits, species_column='species'):
+    """
+    Codifica las columnas `traits` de `trait_data`. Las columnas numéricas se
+    tratan como rasgos continuos y el resto como categóricos.
+    """
+    numeric_traits = [trait for trait in traits if pd.api.types.is_numeric_dtype(trait_data[trait])]
+    categorical_traits = [trait for trait in traits if trait not in numeric_traits]
+
+    numeric = trait_data[numeric_traits].to_numpy(dtype=float)
+    low, high = numeric.min(axis=0), numeric.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    numeric = (numeric - low) / span
+
+    codes = np.column_stack([pd.factorize(trait_data[trait])[0] for trait in categorical_traits]) \
+        if categorical_traits else np.empty((len(trait_data), 0), dtype=np.int64)
+    return TraitMatrix(list(trait_data[species_column]), numeric, codes,
+                       numeric_traits, categorical_traits)
+
+def gower_similarity(traits, rows=slice(None)):
+    """
+    Similitud de Gower entre las especies `rows` y todas las especies, forma
+    (filas, especies).
+    """
+    numeric, codes = traits.numeric, traits.codes
+    total = np.zeros((len(numeric[rows]), traits.n_species))
+    for k in range(numeric.shape[1]):
+        column = numeric[:, k]
+        total += 1 - np.abs(column[rows, None] - column[None, :])
+    for k in range(codes.shape[1]):
+        column = codes[:, k]
+        total += column[rows, None] == column[None, :]
+    return total / traits.n_traits
+
+def similarity_edges(traits, threshold=0.5, block_size=BLOCK_SIZE):
+    """
+    Pares de especies (i < j) con similitud mayor que `threshold`, como
+    matriz dispersa triangular superior (COO) con la similitud como valor.
+    """
+    rows, cols, values = [], [], []
+    for start in range(0, traits.n_species, block_size):
+        block = gower_similarity(traits, slice(start, start + block_size))
+        i, j = np.nonzero(block > threshold)
+        i += start
+        upper = j > i
+        rows.append(i[upper])
+        cols.append(j[upper])
+        values.append(block[i[upper] - start, j[upper]])
+    return sparse.coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(traits.n_species, traits.n_species))
+
+def gower_distance(traits, rows=slice(None)):
+    """
+    Distancia de Gower (1 - similitud) entre las especies `rows` y todas.
+    """
+    return 1 - gower_similarity(traits, rows)
+
+def iter_gower_blocks(traits, block_size=BLOCK_SIZE):
+    """
+    Recorre la matriz de distancias de Gower por bloques de filas y entrega
+    (filas, bloque filas x especies).
+    """
+    for start in range(0, traits.n_species, block_size):
+        rows = slice(start, min(start + block_size, traits.n_species))
+        yield rows, gower_distance(traits, rows)
+
+def _traits_key(traits, n_axes):
+    digest = hashlib.sha1(repr((traits.numeric.shape, traits.codes.shape, n_axes)).encode())
+    digest.update(np.ascontiguousarray(traits.numeric).tobytes())
+    digest.update(np.ascontiguousarray(traits.codes).tobytes())
+    return digest.hexdigest()[:16]
+
+def _centered_operator(distances, block_size):
+    """
+    Operador B = -1/2 J D J (J centra filas y columnas) aplicado por bloques
+    de filas de `distances`, que puede ser un memory-map.
+    """
+    n_species = len(distances)
+
+    def matmat(v):
+        v = np.asarray(v, dtype=float).reshape(n_species, -1)
+        v = v - v.mean(axis=0)
+        out = np.empty_like(v)
+        for start in range(0, n_species, block_size):
+            out[start:start + block_size] = distances[start:start + block_size] @ v
+        return -0.5 * (out - out.mean(axis=0))
+
+    return LinearOperator((n_species, n_species), matvec=matmat, matmat=matmat, dtype=float)
+
+def compute_pcoa(traits, n_axes=FRIC_AXES, block_size=BLOCK_SIZE):
+    """
+    Coordenadas principales (especies x `n_axes`) de √d de Gower. Los ejes
+    con autovalor no positivo quedan en 0.
+    """
+    n_species = traits.n_species
+    if n_species <= max(block_size, n_axes + 1):
+        # Con √d los cuadrados de las distancias son la propia d de Gower
+        distances = gower_distance(traits)
+        centered = distances - distances.mean(axis=0) - distances.mean(axis=1)[:, None] + distances.mean()
+        values, vectors = np.linalg.eigh(-0.5 * centered)
+        values, vectors = values[::-1][:n_axes], vectors[:, ::-1][:, :n_axes]
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = os.path.join(cache_dir, f'gower.{os.getpid()}.tmp.npy')
+        distances = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                              shape=(n_species, n_species))
+        try:
+            for rows, block in iter_gower_blocks(traits, block_size):
+                distances[rows] = block
+            values, vectors = eigsh(_centered_operator(distances, block_size), k=n_axes, which='LA')
+            order = np.argsort(values)[::-1]
+            values, vectors = values[order], vectors[:, order]
+        finally:
+            del distances
+            os.remove(tmp_path)
+
+    coordinates = np.zeros((n_species, n_axes))
+    positive = values > 1e-12
+    coordinates[:, :positive.sum()] = vectors[:, positive] * np.sqrt(values[positive])
+    return coordinates
+
+def pcoa(traits, n_axes=FRIC_AXES, use_cache=True):
+    """
+    Devuelve `compute_pcoa`, guardado en `cache_dir` y reutilizado mientras
+    los rasgos no cambien.
+    """
+    if not use_cache:
+        return compute_pcoa(traits, n_axes)
+
+    path = os.path.join(cache_dir, f'pcoa_{_traits_key(traits, n_axes)}.npy')
+    if os.path.exists(path):
+        return np.load(path)
+    coordinates = compute_pcoa(traits, n_axes)
+    save_npy_atomic(path, coordinates)
+    return coordinates
+
+def align_abundances(abundances, species, traits):
+    """
+    Reordena las columnas de `abundances` (muestras x `species`) al orden de
+    especies de `traits`; las especies sin rasgos son un error.
+    """
+    position = {name: k for k, name in enumerate(species)}
+    missing = [name for name in traits.species if name not in position]
+    if missing:
+        raise KeyError(f"Especies sin abundancias: {missing}")
+    extra = [name for name in species if name not in set(traits.species)]
+    if extra:
+        raise KeyError(f"Especies sin rasgos: {extra}")
+    return np.asarray(abundances, dtype=float)[:, [position[name] for name in traits.species]]
+
+def functional_richness(abundances, coordinates):
+    """
+    Volumen de la envolvente convexa de las especies presentes en cada
+    muestra (NaN si hay menos especies distintas que ejes + 1).
+    """
+    n_axes = coordinates.shape[1]
+    result = np.full(len(abundances), np.nan)
+    for i, row in enumerate(np.asarray(abundances)):
+        points = np.unique(coordinates[row > 0], axis=0)
+        if len(points) <= n_axes:
+            continue
+        try:
+            result[i] = ConvexHull(points).volume
+        except QhullError:
+            # Puntos en un subespacio de menor dimensión: volumen nulo
+            result[i] = 0.0
+    return result
+
+def functional_indices(abundances, species, traits, n_axes=FRIC_AXES, block_size=BLOCK_SIZE):
+    """
+    Rao Q funcional, FDis y FRic de cada muestra de `abundances` (muestras x
+    `species`) en una pasada por bloques sobre las distancias de Gower.
+    Devuelve un DataFrame con columnas rao_q, fdis y fric.
+    """
+    weights = align_abundances(abundances, species, traits)
+    totals = weights.sum(axis=1, keepdims=True)
+    relative = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+    # z[s, j] = Σ_k a_sk d_jk, acumulado por bloques de especies j; las
+    # muestras suelen tener pocas especies, así que `relative` va dispersa
+    z = np.empty_like(relative)
+    relative_sparse = sparse.csr_matrix(relative)
+    for rows, block in iter_gower_blocks(traits, block_size):
+        z[:, rows] = relative_sparse @ block.T
+    rao_q = np.einsum('ij,ij->i', z, relative)
+    to_centroid = np.sqrt(np.maximum(z - rao_q[:, None] / 2, 0.0))
+
+    return pd.DataFrame({
+        'rao_q': rao_q,
+        'fdis': np.einsum('ij,ij->i', to_centroid, relative),
+        'fric': functional_richness(weights, pcoa(traits, n_axes)),
+    })
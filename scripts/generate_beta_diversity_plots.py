@@ -2,11 +2,15 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.spatial.distance import pdist, squareform
+
+from beta_diversity import PresenceMatrix, beta_indices_by_group, pair_labels, similarities
 
 def generate_synthetic_species_data(n_stations=10, n_species=30, n_depths=4):
     """
     Genera datos sintéticos de presencia/ausencia de especies para diferentes estaciones y profundidades.
+
+    Devuelve un diccionario {profundidad: PresenceMatrix} con una fila por
+    estación (etiquetas 'E1', 'E2', ...) guardada como bits empaquetados.
     """
     # Probabilidades base de presencia para cada profundidad
     depth_probs = {
@@ -17,10 +21,12 @@ def generate_synthetic_species_data(n_stations=10, n_species=30, n_depths=4):
     }
     
     depths = [0, 50, 100, 200]
-    data = []
+    stations = [f'E{station+1}' for station in range(n_stations)]
+    data = {}
     
     for depth in depths:
         base_prob = depth_probs[depth]
+        presence = np.zeros((n_stations, n_species), dtype=bool)
         
         # Añadir variación espacial
         for station in range(n_stations):
@@ -29,54 +35,33 @@ def generate_synthetic_species_data(n_stations=10, n_species=30, n_depths=4):
             
             # Generar presencias/ausencias
             species_probs = base_prob * station_factor * np.random.beta(2, 2, n_species)
-            presences = np.random.binomial(1, species_probs)
-            
-            data.append({
-                'station': f'E{station+1}',
-                'depth': depth,
-                'species': presences
-            })
+            presence[station] = np.random.binomial(1, species_probs)
+        
+        data[depth] = PresenceMatrix.from_dense(presence, sites=stations)
     
     return data
 
 def calculate_beta_indices(data):
     """
     Calcula índices de diversidad beta entre pares de estaciones para cada profundidad.
+
+    `data` es el diccionario {profundidad: PresenceMatrix} de
+    `generate_synthetic_species_data`. Las especies compartidas de todos los
+    pares (y de todas las profundidades a la vez) salen de AND bit a bit y
+    conteo de bits; ver `beta_diversity.beta_indices`.
     """
-    results = []
-    depths = [0, 50, 100, 200]
+    depths = list(data)
+    presence = [data[depth] for depth in depths]
     
-    for depth in depths:
-        depth_data = [d['species'] for d in data if d['depth'] == depth]
-        stations = [d['station'] for d in data if d['depth'] == depth]
-        
-        # Calcular matrices de similitud
-        n_stations = len(depth_data)
-        
-        for i in range(n_stations):
-            for j in range(i+1, n_stations):
-                sp1 = depth_data[i]
-                sp2 = depth_data[j]
-                
-                # Calcular componentes
-                a = sum(sp1)  # Especies en sitio 1
-                b = sum(sp2)  # Especies en sitio 2
-                j = sum(sp1 & sp2)  # Especies compartidas
-                
-                # Calcular índices
-                whittaker = (a + b - 2*j) / ((a + b)/2)
-                jaccard = j / (a + b - j) if (a + b - j) > 0 else 0
-                sorensen = 2*j / (a + b) if (a + b) > 0 else 0
-                
-                results.append({
-                    'depth': depth,
-                    'station_pair': f'{stations[i]}-{stations[j]}',
-                    'whittaker': whittaker,
-                    'jaccard': jaccard,
-                    'sorensen': sorensen
-                })
+    frames = []
+    for depth, matrix, indices in zip(depths, presence, beta_indices_by_group(presence)):
+        frames.append(pd.DataFrame({
+            'depth': depth,
+            'station_pair': pair_labels(matrix.sites),
+            **similarities(indices)
+        }))
     
-    return pd.DataFrame(results)
+    return pd.concat(frames, ignore_index=True)
 
 def plot_beta_diversity_comparison(df):
     """
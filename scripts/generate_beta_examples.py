@@ -1,8 +1,11 @@
+import zlib
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.spatial.distance import pdist, squareform
+
+from beta_diversity import PresenceMatrix, beta_indices, similarities
 
 def generate_amp_comparison_data():
     """
@@ -22,43 +25,26 @@ def generate_amp_comparison_data():
     amp_data = np.random.binomial(1, amp_prob, (3, n_species))
     no_amp_data = np.random.binomial(1, no_amp_prob, (3, n_species))
     
-    # Combinar datos
-    all_data = np.vstack([amp_data, no_amp_data])
-    
-    # Calcular índices beta para cada par de sitios
+    # Combinar datos en una matriz de presencia empaquetada en bits
     sites = ['AMP1', 'AMP2', 'AMP3', 'No-AMP1', 'No-AMP2', 'No-AMP3']
-    comparisons = []
-    
-    for i in range(n_sites):
-        for j in range(i+1, n_sites):
-            # Calcular componentes
-            shared = np.sum(all_data[i] & all_data[j])
-            total_i = np.sum(all_data[i])
-            total_j = np.sum(all_data[j])
-            
-            # Calcular índices
-            whittaker = (total_i + total_j - 2*shared) / ((total_i + total_j)/2)
-            jaccard = shared / (total_i + total_j - shared) if (total_i + total_j - shared) > 0 else 0
-            sorensen = 2*shared / (total_i + total_j) if (total_i + total_j) > 0 else 0
-            
-            # Determinar tipo de comparación
-            if i < 3 and j < 3:
-                comparison_type = 'Entre AMPs'
-            elif i >= 3 and j >= 3:
-                comparison_type = 'Entre No-AMPs'
-            else:
-                comparison_type = 'AMP vs No-AMP'
-            
-            comparisons.append({
-                'site1': sites[i],
-                'site2': sites[j],
-                'comparison_type': comparison_type,
-                'whittaker': whittaker,
-                'jaccard': jaccard,
-                'sorensen': sorensen
-            })
-    
-    return pd.DataFrame(comparisons)
+    presence = PresenceMatrix.from_dense(np.vstack([amp_data, no_amp_data]), sites=sites)
+    
+    # Calcular índices beta para todos los pares de sitios a la vez
+    i, j = np.triu_indices(n_sites, k=1)
+    # Jaccard y Sørensen como similitudes, como se grafican
+    indices = similarities(beta_indices(presence))
+    
+    # Determinar tipo de comparación
+    is_amp = np.arange(n_sites) < 3
+    comparison_type = np.where(is_amp[i] & is_amp[j], 'Entre AMPs',
+                               np.where(~is_amp[i] & ~is_amp[j], 'Entre No-AMPs', 'AMP vs No-AMP'))
+    
+    return pd.DataFrame({
+        'site1': np.array(sites)[i],
+        'site2': np.array(sites)[j],
+        'comparison_type': comparison_type,
+        **indices
+    })
 
 def plot_individual_beta_diversity_amp(df, index_name):
     """
@@ -98,11 +84,13 @@ def plot_individual_beta_diversity_amp(df, index_name):
                 dpi=300, bbox_inches='tight')
     plt.close()
 
-def generate_temporal_comparison_individual(index_name):
+def generate_temporal_data(index_name):
     """
-    Genera visualización temporal individual para un índice con patrones únicos.
+    Genera la serie temporal sintética (año, estación, valor) de un índice con
+    patrones únicos.
     """
-    np.random.seed(42 + hash(index_name) % 1000)  # Semilla única para cada índice
+    # Semilla única para cada índice (crc32 en lugar de hash(): estable entre ejecuciones)
+    np.random.seed(42 + zlib.crc32(index_name.encode()) % 1000)
     
     years = np.arange(2019, 2024)
     seasons = ['Verano', 'Otoño', 'Invierno', 'Primavera']
@@ -169,7 +157,14 @@ def generate_temporal_comparison_individual(index_name):
                 'value': value
             })
     
-    df = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+def generate_temporal_comparison_individual(index_name):
+    """
+    Genera visualización temporal individual para un índice con patrones únicos.
+    """
+    df = generate_temporal_data(index_name)
+    seasons = ['Verano', 'Otoño', 'Invierno', 'Primavera']
     
     # Crear visualización
     plt.figure(figsize=(12, 8))
@@ -0,0 +1,160 @@
+"""
+Disposición de redes por fuerzas
+--------------------------------
+Calcula posiciones 2D para redes de especies (p. ej. la red funcional de
+`phylogenetic_diversity_workflow`) con el algoritmo de Fruchterman-Reingold
+y repulsión aproximada al estilo Barnes-Hut:
+
+- cada nodo recibe repulsión exacta de sus `NEAR_NEIGHBORS` vecinos más
+  cercanos, obtenidos de un `cKDTree` (un número fijo aunque la red se
+  contraiga en una maraña densa);
+- los nodos más lejanos se agrupan en una rejilla gruesa (a lo sumo
+  `MAX_CELLS` x `MAX_CELLS` celdas) y cada celda más allá de esos vecinos
+  repele como una masa en su centroide.
+
+Junto con la atracción vectorizada sobre la lista de aristas, cada iteración
+cuesta O(nodos x (vecinos + celdas) + aristas) en lugar de O(nodos²), lo que permite
+redes de miles de especies con aristas dispersas.
+
+La posición inicial sale de una semilla fija, así que el resultado es el
+mismo en cada ejecución, y las posiciones se guardan en `cache_dir` bajo una
+clave de los nodos, las aristas, los pesos y los parámetros: volver a
+dibujar la misma red no recalcula nada.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from cache_io import save_npy_atomic
+
+# Directorio para posiciones reutilizables entre ejecuciones
+cache_dir = os.path.join('.cache', 'layout')
+
+# Cambiar al modificar el algoritmo: invalida las posiciones en caché
+LAYOUT_VERSION = 1
+
+ITERATIONS = 50
+SEED = 42
+
+# Vecinos con repulsión exacta por nodo
+NEAR_NEIGHBORS = 16
+
+# Celdas por lado de la rejilla de repulsión lejana y nodos por bloque al
+# evaluarla (bloque x celdas² vectores en memoria)
+MAX_CELLS = 16
+NODE_BLOCK = 4096
+
+# Atracción lineal de cada nodo hacia el centro de la red
+GRAVITY = 1.0
+
+def _accumulate(n_nodes, index, values):
+    """
+    Suma por nodo de vectores 2D (equivalente a np.add.at, más rápido).
+    """
+    return np.column_stack([np.bincount(index, weights=values[:, 0], minlength=n_nodes),
+                            np.bincount(index, weights=values[:, 1], minlength=n_nodes)])
+
+def _far_repulsion(pos, k, radius, n_cells):
+    """
+    Repulsión k²·m/d de las celdas de una rejilla n_cells x n_cells (masa m
+    en su centroide) sobre cada nodo, sólo desde centroides más lejanos que
+    el `radius` de ese nodo.
+    """
+    low = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - low, 1e-9)
+    cell = np.minimum(((pos - low) / span * n_cells).astype(np.int64), n_cells - 1)
+    cell = cell[:, 0] * n_cells + cell[:, 1]
+    mass = np.bincount(cell, minlength=n_cells ** 2)
+    occupied = mass > 0
+    mass = mass[occupied]
+    centroid = _accumulate(n_cells ** 2, cell, pos)[occupied] / mass[:, None]
+
+    # Σ_c s_c (x - c) = x Σ_c s_c - S @ c, sin arreglos nodos x celdas x 2
+    force = np.empty_like(pos)
+    for start in range(0, len(pos), NODE_BLOCK):
+        block = pos[start:start + NODE_BLOCK]
+        distance2 = ((block ** 2).sum(axis=1)[:, None] + (centroid ** 2).sum(axis=1)[None, :]
+                     - 2 * block @ centroid.T)
+        limit = radius[start:start + NODE_BLOCK, None] ** 2
+        strength = np.where(distance2 > limit, k * k * mass / np.maximum(distance2, 1e-18), 0.0)
+        force[start:start + NODE_BLOCK] = block * strength.sum(axis=1)[:, None] - strength @ centroid
+    return force
+
+def force_layout(n_nodes, sources, targets, weights=None, iterations=ITERATIONS, seed=SEED):
+    """
+    Posiciones (nodos x 2) en [-1, 1] para una red con aristas
+    `sources[e]` - `targets[e]` (índices de nodo) y pesos opcionales.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=float)
+
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n_nodes, 2))
+    if n_nodes < 2:
+        return pos * 0
+
+    k = np.sqrt(1.0 / n_nodes)
+    n_cells = int(min(MAX_CELLS, max(2, np.sqrt(n_nodes) / 2)))
+    n_near = min(NEAR_NEIGHBORS, n_nodes - 1)
+    temperatures = np.linspace(0.1, 0, iterations + 1)[:-1]
+    for temperature in temperatures:
+        # Repulsión k²/d exacta desde los vecinos más cercanos de cada nodo
+        distance, near = cKDTree(pos).query(pos, k=n_near + 1)
+        distance, near = distance[:, 1:], near[:, 1:]
+        delta = pos[:, None, :] - pos[near]
+        strength = k * k / np.maximum(distance, 1e-9) ** 2
+        displacement = (delta * strength[..., None]).sum(axis=1)
+        displacement += _far_repulsion(pos, k, distance[:, -1], n_cells)
+
+        # Atracción d²/k a lo largo de las aristas, proporcional al peso
+        delta = pos[sources] - pos[targets]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-9)
+        pull = delta * (weights * distance / k)[:, None]
+        displacement += _accumulate(n_nodes, targets, pull) - _accumulate(n_nodes, sources, pull)
+
+        # Gravedad hacia el centro: mantiene juntas las componentes y los
+        # nodos aislados (en lugar de apilarlos contra un marco fijo)
+        displacement -= GRAVITY * (pos - pos.mean(axis=0))
+
+        # Desplazamiento limitado por la temperatura
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-9)
+        pos += displacement * (np.minimum(length, temperature) / length)[:, None]
+
+    pos -= pos.mean(axis=0)
+    return pos / max(np.abs(pos).max(), 1e-9)
+
+def _layout_key(nodes, sources, targets, weights, iterations, seed):
+    # Todo lo que cambia las posiciones: algoritmo, parámetros y red
+    # (NODE_BLOCK sólo reparte el cálculo en bloques)
+    parameters = (LAYOUT_VERSION, NEAR_NEIGHBORS, MAX_CELLS, GRAVITY, iterations, seed)
+    digest = hashlib.sha1(repr((len(nodes),) + parameters).encode())
+    digest.update('\n'.join(map(str, nodes)).encode())
+    for array in (sources, targets, weights):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+def graph_layout(G, weight='weight', iterations=ITERATIONS, seed=SEED, use_cache=True):
+    """
+    Posiciones {nodo: (x, y)} de un grafo de networkx, con el mismo formato
+    que `nx.spring_layout`. Con `use_cache` se reutilizan las de una red
+    idéntica calculada antes.
+    """
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = list(G.edges(data=weight, default=1.0))
+    sources = np.array([index[u] for u, _, _ in edges], dtype=np.int64)
+    targets = np.array([index[v] for _, v, _ in edges], dtype=np.int64)
+    weights = np.array([w for _, _, w in edges], dtype=float)
+
+    path = os.path.join(cache_dir, f'{_layout_key(nodes, sources, targets, weights, iterations, seed)}.npy')
+    if use_cache and os.path.exists(path):
+        pos = np.load(path)
+    else:
+        pos = force_layout(len(nodes), sources, targets, weights, iterations, seed)
+        if use_cache:
+            save_npy_atomic(path, pos)
+    return dict(zip(nodes, pos))
@@ -0,0 +1,344 @@
+"""
+Índices de diversidad filogenética
+----------------------------------
+Calcula la diversidad filogenética de Faith (PD) y la entropía cuadrática de
+Rao (Q) de todas las muestras de una tabla de abundancias a la vez y escribe
+`results/diversity_indices.csv` (station, depth, faith_pd, rao_q, richness).
+
+El árbol (Newick) se recorre una sola vez para aplanarlo en arreglos en postorden: padre de cada nodo y
+longitud de la rama que lo une a su padre. Con ellos se arma una matriz
+dispersa de incidencia puntas x nodos (A[t, n] = 1 si el nodo n está en el
+camino de la raíz a la punta t). Para un bloque de muestras:
+
+- Faith PD: las ramas cubiertas por una muestra son los nodos con alguna
+  especie presente debajo, (P @ A) > 0, y PD = ((P @ A) > 0) @ longitudes.
+- Rao Q = Σ_ij p_i p_j d_ij con d la distancia cofenética. Cada rama separa
+  la masa relativa m que cuelga de ella del resto (1 - m), así que
+  Q = Σ_ramas 2 · longitud · m (1 - m), con m = p @ A. Es la misma forma
+  cuadrática sin construir la matriz cofenética de especies x especies; si
+  ya se tiene una (`cophenetic_matrix`) puede pasarse como `distances`.
+
+`PhylogeneticDistances` guarda la matriz cofenética completa de un árbol en
+`cache_dir` (float32, memory-map) y calcula con ella Rao Q, la distancia
+media entre pares (MPD) y la distancia media al vecino más cercano (MNTD)
+leyendo sólo las filas de las especies de cada análisis.
+
+El árbol se pasa siempre explícitamente: para `results/diversity_indices.csv`
+es el árbol de 18S del flujo de `bitacoras/diversidad_filogen.md` (el
+`.treefile` de IQ-TREE). Las especies se emparejan con las puntas ignorando
+'_' y espacios.
+
+Uso:
+    python scripts/phylo_indices.py árbol.nwk [data/abundance_data.csv] [salida.csv]
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from Bio import Phylo
+
+from abundance_io import iter_chunks, read_header
+from cache_io import open_npy_atomic
+
+output_path = os.path.join('results', 'diversity_indices.csv')
+
+# Directorio para matrices cofenéticas reutilizables entre ejecuciones
+cache_dir = os.path.join('.cache', 'phylo')
+
+# Muestras por bloque: la matriz densa muestras x nodos de un bloque es lo
+# único que crece con el tamaño del árbol
+BLOCK_SIZE = 2048
+
+def _normalize_name(name):
+    return name.replace('_', ' ').strip()
+
+class FlatTree:
+    """
+    Árbol aplanado en postorden (los hijos antes que su padre, la raíz al
+    final). `parent[n]` es el índice del padre del nodo n (-1 en la raíz),
+    `branch_length[n]` la longitud de la rama sobre n y `tip_nodes[k]` el
+    nodo de la punta `tip_names[k]`.
+    """
+    def __init__(self, parent, branch_length, tip_names, tip_nodes):
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.branch_length = np.asarray(branch_length, dtype=float)
+        self.tip_names = list(tip_names)
+        self.tip_nodes = np.asarray(tip_nodes, dtype=np.int64)
+        self._tip_lookup = {_normalize_name(name): k for k, name in enumerate(self.tip_names)}
+        self._incidence = None
+
+    @classmethod
+    def from_phylo(cls, tree):
+        """
+        Aplana un árbol de `Bio.Phylo`. Las ramas sin longitud valen 0.
+        """
+        clades = list(tree.find_clades(order='postorder'))
+        index = {id(clade): n for n, clade in enumerate(clades)}
+        parent = np.full(len(clades), -1, dtype=np.int64)
+        for n, clade in enumerate(clades):
+            for child in clade.clades:
+                parent[index[id(child)]] = n
+        branch_length = [clade.branch_length or 0.0 for clade in clades]
+        # La rama sobre la raíz no forma parte de ningún camino entre especies
+        branch_length[-1] = 0.0
+        tips = [n for n, clade in enumerate(clades) if not clade.clades]
+        return cls(parent, branch_length, [clades[n].name for n in tips], tips)
+
+    @classmethod
+    def read(cls, path, format='newick'):
+        """
+        Lee un árbol desde una ruta o un archivo abierto (p. ej. StringIO).
+        """
+        return cls.from_phylo(Phylo.read(path, format))
+
+    @property
+    def n_nodes(self):
+        return len(self.parent)
+
+    @property
+    def n_tips(self):
+        return len(self.tip_nodes)
+
+    def tip_index(self, species):
+        """
+        Posición de cada especie entre las puntas del árbol (-1 si no está).
+        """
+        return np.array([self._tip_lookup.get(_normalize_name(name), -1) for name in species],
+                        dtype=np.int64)
+
+    def incidence(self):
+        """
+        Matriz dispersa puntas x nodos con un 1 en cada nodo del camino de la
+        raíz a la punta (incluida la punta). Se calcula una vez subiendo todas
+        las puntas a la vez, un nivel por iteración.
+        """
+        if self._incidence is None:
+            rows, cols = [], []
+            tips = np.arange(self.n_tips)
+            nodes = self.tip_nodes
+            while len(nodes):
+                rows.append(tips)
+                cols.append(nodes)
+                nodes = self.parent[nodes]
+                tips = tips[nodes >= 0]
+                nodes = nodes[nodes >= 0]
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            self._incidence = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                                                shape=(self.n_tips, self.n_nodes))
+        return self._incidence
+
+    def key(self):
+        """
+        Huella del árbol (topología, longitudes y nombres) para las cachés.
+        """
+        digest = hashlib.sha1(self.parent.tobytes())
+        digest.update(self.branch_length.tobytes())
+        digest.update('\n'.join(self.tip_names).encode())
+        return digest.hexdigest()[:16]
+
+    def cophenetic_matrix(self, tips=None, columns=None):
+        """
+        Distancias cofenéticas entre las puntas `tips` (todas por defecto) y
+        las puntas `columns` (por defecto las mismas): d_ij = h_i + h_j - 2 h_ij,
+        con h_ij la longitud del camino compartido desde la raíz.
+        """
+        tips = np.arange(self.n_tips) if tips is None else np.asarray(tips)
+        columns = tips if columns is None else np.asarray(columns)
+        incidence = self.incidence()
+        rows, cols = incidence[tips], incidence[columns]
+        shared = (rows @ sparse.diags(self.branch_length) @ cols.T).toarray()
+        row_height = rows @ self.branch_length
+        col_height = cols @ self.branch_length
+        distances = row_height[:, None] + col_height[None, :] - 2 * shared
+        # Redondeo: la distancia de una punta a sí misma es exactamente 0
+        distances[tips[:, None] == columns[None, :]] = 0.0
+        return np.maximum(distances, 0.0, out=distances)
+
+def _match_species(tree, species):
+    """
+    Columnas de la tabla presentes en el árbol y sus puntas.
+    """
+    tips = tree.tip_index(species)
+    missing = [name for name, tip in zip(species, tips) if tip < 0]
+    if missing:
+        print(f"Advertencia: especies sin punta en el árbol (se omiten): {missing}")
+    columns = np.flatnonzero(tips >= 0)
+    return columns, tips[columns]
+
+def _relative(abundances):
+    totals = abundances.sum(axis=1, keepdims=True)
+    return np.divide(abundances, totals, out=np.zeros_like(abundances), where=totals > 0)
+
+def _node_blocks(weights, incidence, block_size):
+    """
+    Recorre `weights` (muestras x puntas) por bloques de filas y entrega
+    (filas, suma de pesos bajo cada nodo) como matriz densa bloque x nodos.
+    """
+    incidence_t = incidence.T.tocsr()
+    for start in range(0, len(weights), block_size):
+        block = np.asarray(weights[start:start + block_size], dtype=float)
+        yield slice(start, start + len(block)), np.asarray(incidence_t @ block.T).T
+
+def faith_pd(abundances, tree, species, block_size=BLOCK_SIZE):
+    """
+    PD de Faith de cada fila de `abundances` (muestras x `species`): suma de
+    las ramas que unen a la raíz las especies presentes.
+    """
+    columns, tips = _match_species(tree, species)
+    presence = np.asarray(abundances)[:, columns] > 0
+    incidence = tree.incidence()[tips]
+    result = np.zeros(len(presence))
+    for rows, covered in _node_blocks(presence, incidence, block_size):
+        result[rows] = (covered > 0) @ tree.branch_length
+    return result
+
+def rao_q(abundances, tree, species, distances=None, block_size=BLOCK_SIZE):
+    """
+    Entropía cuadrática de Rao de cada fila de `abundances` con las
+    abundancias relativas de las especies del árbol. Sin `distances` se usa
+    la forma por ramas (ver docstring del módulo); con una matriz cofenética
+    `distances` (especies del árbol en el orden de `species`) se evalúa
+    (p @ D) · p por bloques. Las muestras vacías valen 0.
+    """
+    columns, tips = _match_species(tree, species)
+    weights = np.asarray(abundances, dtype=float)[:, columns]
+    result = np.zeros(len(weights))
+    if distances is not None:
+        distances = np.asarray(distances)
+        for start in range(0, len(weights), block_size):
+            p = _relative(weights[start:start + block_size])
+            result[start:start + len(p)] = np.einsum('ij,ij->i', p @ distances, p)
+        return result
+
+    incidence = tree.incidence()[tips]
+    for rows, mass in _node_blocks(_relative(weights), incidence, block_size):
+        result[rows] = 2 * (mass * (1 - mass)) @ tree.branch_length
+    return result
+
+class PhylogeneticDistances:
+    """
+    Distancias cofenéticas entre todas las puntas de un árbol, calculadas una
+    sola vez por bloques de filas y guardadas en `cache_dir` como float32 bajo
+    la huella del árbol (`FlatTree.key`). La matriz se abre como memory-map,
+    así que cada análisis lee sólo las filas de las especies que usa.
+    """
+    def __init__(self, tree, use_cache=True, block_size=BLOCK_SIZE):
+        self.tree = tree
+        self.block_size = block_size
+        self.matrix = self._load() if use_cache else self._build(
+            np.empty((tree.n_tips, tree.n_tips), dtype=np.float32))
+
+    def _build(self, out):
+        all_tips = np.arange(self.tree.n_tips)
+        for start in range(0, self.tree.n_tips, self.block_size):
+            tips = all_tips[start:start + self.block_size]
+            out[tips] = self.tree.cophenetic_matrix(tips, all_tips)
+        return out
+
+    def _load(self):
+        path = os.path.join(cache_dir, f'cophenetic_{self.tree.key()}.npy')
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r')
+
+        # Escritura atómica para que otro proceso nunca lea una matriz a medias
+        with open_npy_atomic(path, np.float32, (self.tree.n_tips, self.tree.n_tips)) as out:
+            self._build(out)
+        return np.load(path, mmap_mode='r')
+
+    def submatrix(self, species):
+        """
+        Distancias entre las especies `species` (en ese orden) leyendo sólo
+        sus filas de la matriz. Todas deben estar en el árbol.
+        """
+        tips = self.tree.tip_index(species)
+        if (tips < 0).any():
+            missing = [name for name, tip in zip(species, tips) if tip < 0]
+            raise KeyError(f"Especies sin punta en el árbol: {missing}")
+        return np.asarray(self.matrix[tips], dtype=float)[:, tips]
+
+    def _weights(self, abundances, species, weighted):
+        columns, _ = _match_species(self.tree, species)
+        weights = np.asarray(abundances, dtype=float)[:, columns]
+        if not weighted:
+            weights = (weights > 0).astype(float)
+        return weights, self.submatrix([species[c] for c in columns])
+
+    def rao_q(self, abundances, species):
+        """
+        Entropía cuadrática de Rao (ver `rao_q`) con la matriz en caché.
+        """
+        columns, _ = _match_species(self.tree, species)
+        distances = self.submatrix([species[c] for c in columns])
+        return rao_q(abundances, self.tree, species, distances=distances,
+                     block_size=self.block_size)
+
+    def mpd(self, abundances, species, weighted=False):
+        """
+        Distancia media entre pares de especies presentes en cada muestra
+        (MPD); con `weighted` cada par pesa el producto de sus abundancias.
+        Vale NaN en muestras con menos de dos especies.
+        """
+        weights, distances = self._weights(abundances, species, weighted)
+        result = np.full(len(weights), np.nan)
+        for start in range(0, len(weights), self.block_size):
+            w = weights[start:start + self.block_size]
+            # La diagonal de D es 0: la suma sólo cuenta pares distintos
+            total = np.einsum('ij,ij->i', w @ distances, w)
+            pairs = w.sum(axis=1) ** 2 - (w ** 2).sum(axis=1)
+            np.divide(total, pairs, out=result[start:start + len(w)],
+                      where=(w > 0).sum(axis=1) >= 2)
+        return result
+
+    def mntd(self, abundances, species, weighted=False):
+        """
+        Distancia media de cada especie presente a su pariente presente más
+        cercano (MNTD); con `weighted` el promedio se pondera por abundancia.
+        Vale NaN en muestras con menos de dos especies.
+        """
+        weights, distances = self._weights(abundances, species, weighted)
+        result = np.full(len(weights), np.nan)
+        for i, row in enumerate(weights):
+            present = np.flatnonzero(row > 0)
+            if len(present) < 2:
+                continue
+            nearest = distances[np.ix_(present, present)]
+            np.fill_diagonal(nearest, np.inf)
+            result[i] = np.average(nearest.min(axis=1), weights=row[present])
+        return result
+
+def diversity_indices_table(tree, path='data/abundance_data.csv'):
+    """
+    Índices por muestra (station, depth, faith_pd, rao_q, richness) de una
+    tabla de abundancias, recorrida por bloques con `abundance_io`, con el
+    árbol `tree` (`FlatTree`).
+    """
+    species, _ = read_header(path)
+    tables = []
+    for chunk in iter_chunks(path):
+        abundances = chunk[species].to_numpy(dtype=np.float32)
+        tables.append(pd.DataFrame({
+            'station': chunk['station'].astype(str).to_numpy(),
+            'depth': chunk['depth'].map('{:g}'.format).to_numpy(),
+            'faith_pd': faith_pd(abundances, tree, species),
+            'rao_q': rao_q(abundances, tree, species),
+            'richness': (abundances > 0).sum(axis=1),
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python scripts/phylo_indices.py árbol.nwk [abundancias.csv] [salida.csv]")
+    tree = FlatTree.read(sys.argv[1])
+    data_path = sys.argv[2] if len(sys.argv) > 2 else 'data/abundance_data.csv'
+    output_path = sys.argv[3] if len(sys.argv) > 3 else output_path
+    print(f"Árbol: {tree.n_tips} puntas, {tree.n_nodes} nodos")
+
+    indices = diversity_indices_table(tree, data_path)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    indices.to_csv(output_path, index=False)
+    print(indices.to_string(index=False))
+    print(f"Índices guardados en {output_path}")
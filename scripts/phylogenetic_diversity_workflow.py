@@ -3,16 +3,22 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import networkx as nx
-from Bio import Phylo
-from io import StringIO
 import os
+import sys
+from io import StringIO
+from scipy.spatial.distance import squareform
+
+from dissimilarity import dissimilarity
+from functional_diversity import encode_traits, functional_indices, similarity_edges
+from network_layout import graph_layout
+from phylo_indices import FlatTree, PhylogeneticDistances
 
 # Configuración de visualización
 sns.set_style("whitegrid")
 os.makedirs('public/images/diversidad', exist_ok=True)
 
 class ZooplanktonDiversityAnalysis:
-    def __init__(self):
+    def __init__(self, tree_path=None):
         self.taxa = {
             "Copepodos": [
                 "Acartia tonsa",
@@ -37,9 +43,25 @@ class ZooplanktonDiversityAnalysis:
         
         self.zones = ["Costera", "Transición", "Oceánica"]
         self.traits = ["Tamaño", "Movilidad", "Estrategia_alimentación", "Reproducción"]
+        self.tree_path = tree_path
         
         self.generate_data()
         
+    def taxonomy_tree(self):
+        """
+        Árbol sintético ultramétrico a partir de `self.taxa` (raíz, grupo,
+        especie). La corona de cada grupo tiene tantas unidades como especies
+        y la raíz está una unidad por encima de la corona más profunda, de
+        modo que las distancias dentro de cada grupo difieren. Reemplaza al
+        árbol real cuando no se indica `tree_path`, igual que el resto de los
+        datos de este análisis.
+        """
+        height = max(len(species) for species in self.taxa.values()) + 1
+        groups = ','.join('(' + ','.join(f"{sp.replace(' ', '_')}:{len(species)}" for sp in species)
+                          + f'){group}:{height - len(species)}'
+                          for group, species in self.taxa.items())
+        return FlatTree.read(StringIO(f'({groups});'))
+        
     def generate_data(self):
         """Genera datos sintéticos para las diferentes métricas de diversidad."""
         np.random.seed(42)
@@ -57,19 +79,23 @@ class ZooplanktonDiversityAnalysis:
         
         self.abundance_df = pd.DataFrame(abundance_data)
         
-        # Matriz de distancias filogenéticas
+        # Distancias filogenéticas (cofenéticas) del árbol de especies (el de
+        # `tree_path` o uno taxonómico sintético), en caché por árbol; sólo se
+        # leen las filas de las especies analizadas
         n_species = len(all_species)
-        self.phylo_distances = np.random.gamma(2, 0.5, (n_species, n_species))
-        self.phylo_distances = (self.phylo_distances + self.phylo_distances.T) / 2
-        np.fill_diagonal(self.phylo_distances, 0)
+        tree = FlatTree.read(self.tree_path) if self.tree_path else self.taxonomy_tree()
+        self.phylo = PhylogeneticDistances(tree)
+        self.phylo_distances = self.phylo.submatrix(all_species)
         
-        # Datos de rasgos funcionales
+        # Datos de rasgos funcionales, con su propio generador para que no
+        # dependan de cuántos sorteos consumen los datos anteriores
+        rng = np.random.default_rng(42)
         self.trait_data = pd.DataFrame({
             'species': all_species,
-            'Tamaño': np.random.uniform(0.5, 5, n_species),
-            'Movilidad': np.random.choice(['Baja', 'Media', 'Alta'], n_species),
-            'Estrategia_alimentación': np.random.choice(['Herbívoro', 'Carnívoro', 'Omnívoro'], n_species),
-            'Reproducción': np.random.choice(['Sexual', 'Asexual', 'Mixta'], n_species)
+            'Tamaño': rng.uniform(0.5, 5, n_species),
+            'Movilidad': rng.choice(['Baja', 'Media', 'Alta'], n_species),
+            'Estrategia_alimentación': rng.choice(['Herbívoro', 'Carnívoro', 'Omnívoro'], n_species),
+            'Reproducción': rng.choice(['Sexual', 'Asexual', 'Mixta'], n_species)
         })
 
     def plot_taxonomic_diversity(self):
@@ -124,30 +150,36 @@ class ZooplanktonDiversityAnalysis:
         plt.savefig('public/images/diversidad/phylogenetic_tree.png', bbox_inches='tight')
         plt.close()
 
+    def functional_network(self):
+        """
+        Red funcional: especies unidas por similitud de rasgos (Gower) de al
+        menos 0.5. Devuelve el grafo y sus posiciones (deterministas, en caché
+        por red).
+        """
+        G = nx.Graph()
+        
+        # Añadir nodos (especies)
+        species = list(self.trait_data['species'])
+        G.add_nodes_from(species)
+
+        # Añadir conexiones basadas en similitud de rasgos (Gower), sólo entre
+        # especies similares
+        edges = similarity_edges(encode_traits(self.trait_data, self.traits), threshold=0.5)
+        G.add_weighted_edges_from((species[i], species[j], similarity)
+                                  for i, j, similarity in zip(edges.row, edges.col, edges.data))
+        return G, graph_layout(G)
+
+    def zone_dissimilarity(self):
+        """Matriz de disimilitud de Bray-Curtis entre zonas (cada par una vez)."""
+        abundance_matrix = self.abundance_df.drop('zone', axis=1).values
+        return squareform(dissimilarity(abundance_matrix, 'braycurtis', use_cache=False))
+
     def plot_functional_network(self):
         """Crea una red de diversidad funcional."""
         plt.figure(figsize=(12, 12))
         
-        # Crear grafo para la red funcional
-        G = nx.Graph()
-        
-        # Añadir nodos (especies)
-        for species in self.trait_data['species']:
-            G.add_node(species)
-        
-        # Añadir conexiones basadas en similitud de rasgos
-        for i, sp1 in enumerate(self.trait_data['species']):
-            traits1 = self.trait_data.iloc[i]
-            for j, sp2 in enumerate(self.trait_data['species'][i+1:], i+1):
-                traits2 = self.trait_data.iloc[j]
-                # Calcular similitud simple
-                similarity = sum(traits1[trait] == traits2[trait] 
-                               for trait in self.traits) / len(self.traits)
-                if similarity > 0.5:  # Solo conectar especies similares
-                    G.add_edge(sp1, sp2, weight=similarity)
-        
-        # Dibujar la red
-        pos = nx.spring_layout(G)
+        # Dibujar la red funcional
+        G, pos = self.functional_network()
         nx.draw(G, pos, with_labels=True, node_color='lightblue',
                 node_size=1000, font_size=8)
         plt.title('Red de Diversidad Funcional del Zooplancton')
@@ -159,25 +191,37 @@ class ZooplanktonDiversityAnalysis:
         """Crea un diagrama de disimilitud entre zonas biogeográficas."""
         plt.figure(figsize=(10, 5))
         
-        # Calcular matriz de disimilitud entre zonas
-        abundance_matrix = self.abundance_df.drop('zone', axis=1).values
-        dissimilarity = np.zeros((len(self.zones), len(self.zones)))
-        
-        for i in range(len(self.zones)):
-            for j in range(len(self.zones)):
-                # Calcular índice de Bray-Curtis
-                sum_min = np.minimum(abundance_matrix[i], abundance_matrix[j]).sum()
-                sum_total = abundance_matrix[i].sum() + abundance_matrix[j].sum()
-                dissimilarity[i,j] = 1 - (2 * sum_min / sum_total)
-        
         # Crear mapa de calor de disimilitud
-        sns.heatmap(dissimilarity, xticklabels=self.zones, yticklabels=self.zones,
+        sns.heatmap(self.zone_dissimilarity(), xticklabels=self.zones, yticklabels=self.zones,
                     cmap='YlOrRd', annot=True, fmt='.2f')
         plt.title('Disimilitud entre Zonas')
         
         plt.savefig('public/images/diversidad/zone_dissimilarity.png', bbox_inches='tight')
         plt.close()
 
+    def phylogenetic_indices(self):
+        """
+        Calcula Rao Q, MPD y MNTD por zona con las distancias cofenéticas.
+        MPD y MNTD se ponderan por abundancia: todas las zonas tienen todas
+        las especies, así que sin ponderar serían iguales en cada zona.
+        """
+        species = list(self.abundance_df.columns.drop('zone'))
+        abundances = self.abundance_df[species].values
+        return pd.DataFrame({
+            'zone': self.zones,
+            'rao_q': self.phylo.rao_q(abundances, species),
+            'mpd': self.phylo.mpd(abundances, species, weighted=True),
+            'mntd': self.phylo.mntd(abundances, species, weighted=True),
+        })
+
+    def functional_indices(self):
+        """Calcula Rao Q funcional, FDis y FRic por zona con distancias de Gower."""
+        species = list(self.abundance_df.columns.drop('zone'))
+        traits = encode_traits(self.trait_data, self.traits)
+        indices = functional_indices(self.abundance_df[species].values, species, traits)
+        indices.insert(0, 'zone', self.zones)
+        return indices
+
     def create_all_visualizations(self):
         """Genera todas las visualizaciones."""
         print("Generando visualización de diversidad taxonómica...")
@@ -194,7 +238,14 @@ class ZooplanktonDiversityAnalysis:
 
 if __name__ == "__main__":
     print("Iniciando análisis de diversidad del zooplancton...")
-    analysis = ZooplanktonDiversityAnalysis()
+    # Árbol Newick opcional; sin él se usa el árbol taxonómico sintético
+    analysis = ZooplanktonDiversityAnalysis(sys.argv[1] if len(sys.argv) > 1 else None)
+    
+    print("Índices filogenéticos por zona:")
+    print(analysis.phylogenetic_indices().to_string(index=False))
+    
+    print("Índices funcionales por zona:")
+    print(analysis.functional_indices().to_string(index=False))
     
     print("Creando visualizaciones...")
     analysis.create_all_visualizations()
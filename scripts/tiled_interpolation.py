@@ -0,0 +1,202 @@
+"""
+Interpolación por teselas a almacenamiento en disco
+---------------------------------------------------
+Versión fuera de memoria de `zooplankton_spatial_analysis.interpolate_layers`
+para grillas regionales que no caben en RAM (p. ej. toda la plataforma de
+Chile central a 50 m de resolución y varias capas de profundidad).
+
+La grilla de salida se recorre por teselas. Cada tesela se amplía con un halo
+que cubre el alcance de cada paso del método:
+
+- el suavizado final (`final_sigma`, en celdas de la grilla de salida),
+- el suavizado multi-escala (el mayor de `smoothing_sigmas`, en celdas de la
+  grilla temporal),
+- el spline cúbico, cuya influencia decae geométricamente (~0.27 por nodo),
+  por lo que `spline_halo` nodos bastan para que el corte sea invisible.
+
+Sobre la ventana ampliada se evalúa el RBF (ajustado una sola vez para todas
+las capas), se suaviza, se aplica el spline y el filtro final, y sólo el
+interior de la tesela se escribe en un arreglo por bloques en disco (Zarr o
+NetCDF4 con chunking). En los bordes reales del dominio la ventana se recorta
+igual que la grilla completa, de modo que el resultado coincide con el de
+`interpolate_layers` salvo errores de redondeo.
+
+Uso:
+    python scripts/tiled_interpolation.py salida.zarr
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+from rbf_interpolation import build_rbf
+from zooplankton_spatial_analysis import (
+    lon_min, lon_max, lat_min, lat_max, grid_size, temp_grid_size,
+    smoothing_sigmas, final_sigma, multiscale_smooth, create_smoothing_buffers,
+    create_land_mask, create_sampling_stations, generate_diversity_data, _spline_matrix,
+)
+
+# Nodos extra de la grilla temporal a cada lado de la ventana para el spline
+SPLINE_HALO = 12
+
+def _filter_radius(sigma, truncate=4.0):
+    # Mismo radio que usan gaussian_filter y correlate1d
+    return int(truncate * sigma + 0.5)
+
+def _source_window(start, stop, n_dst, n_src, halo):
+    """
+    Rango de nodos de la grilla temporal que cubre los puntos [start, stop) de
+    la grilla de salida más `halo` nodos a cada lado, recortado al dominio.
+    """
+    scale = (n_src - 1) / (n_dst - 1)
+    src_start = math.floor(start * scale) - halo
+    src_stop = math.ceil((stop - 1) * scale) + 1 + halo
+    return max(src_start, 0), min(src_stop, n_src)
+
+def tile_slices(shape, tile_size):
+    """
+    Recorre la grilla `shape` en teselas de `tile_size` y entrega pares de
+    slices (filas, columnas).
+    """
+    ny, nx = shape
+    ty, tx = (tile_size, tile_size) if np.isscalar(tile_size) else tile_size
+    for y0 in range(0, ny, ty):
+        for x0 in range(0, nx, tx):
+            yield slice(y0, min(y0 + ty, ny)), slice(x0, min(x0 + tx, nx))
+
+def open_tiled_store(path, shape, chunks, dtype=np.float64, bounds=None):
+    """
+    Crea un arreglo por bloques capas x ny x nx en `path` y devuelve
+    (arreglo, función para cerrarlo). El formato se elige por la extensión:
+    '.zarr' usa Zarr y '.nc' NetCDF4 con chunking y compresión.
+    """
+    bounds = bounds or (lon_min, lon_max, lat_min, lat_max)
+    n_layers, ny, nx = shape
+
+    if path.endswith('.zarr'):
+        try:
+            import zarr
+        except ImportError as e:
+            raise ImportError("Se necesita el paquete 'zarr' para escribir archivos .zarr") from e
+        array = zarr.open_array(store=path, mode='w', shape=shape, chunks=chunks,
+                                dtype=dtype, fill_value=np.nan)
+        array.attrs.update({'lon_min': bounds[0], 'lon_max': bounds[1],
+                            'lat_min': bounds[2], 'lat_max': bounds[3],
+                            'dimensions': ['layer', 'lat', 'lon']})
+        return array, lambda: None
+
+    if path.endswith('.nc'):
+        try:
+            import netCDF4
+        except ImportError as e:
+            raise ImportError("Se necesita el paquete 'netCDF4' para escribir archivos .nc") from e
+        dataset = netCDF4.Dataset(path, 'w')
+        dataset.createDimension('layer', n_layers)
+        dataset.createDimension('lat', ny)
+        dataset.createDimension('lon', nx)
+        dataset.createVariable('lat', 'f8', ('lat',))[:] = np.linspace(bounds[2], bounds[3], ny)
+        dataset.createVariable('lon', 'f8', ('lon',))[:] = np.linspace(bounds[0], bounds[1], nx)
+        variable = dataset.createVariable('diversity', np.dtype(dtype), ('layer', 'lat', 'lon'),
+                                          chunksizes=chunks, zlib=True, fill_value=np.nan)
+        return variable, dataset.close
+
+    raise ValueError(f"Formato de salida desconocido: {path!r} (use .zarr o .nc)")
+
+def interpolate_tiled(lon_stations, lat_stations, values, output_path, shape=None,
+                      bounds=None, temp_shape=None, tile_size=512, backend='rbf',
+                      neighbors=None, land_mask=False, dtype=np.float64,
+                      spline_halo=SPLINE_HALO):
+    """
+    Interpola una o varias capas (`values` vector o matriz estaciones x capas)
+    a una grilla `shape` = (ny, nx) sobre `bounds` = (lon_min, lon_max,
+    lat_min, lat_max) y la escribe tesela a tesela en `output_path`.
+
+    `temp_shape` es el tamaño de la grilla temporal del RBF; por defecto
+    mantiene la proporción temp_grid_size / grid_size de la grilla original,
+    de modo que las escalas del suavizado conservan su sentido. Con
+    `land_mask=True` cada tesela se enmascara con `create_land_mask`.
+    `dtype` es el tipo del suavizado, el spline y el arreglo en disco (el
+    ajuste RBF siempre es float64, como en `interpolate_layers`).
+    Devuelve `output_path`.
+    """
+    dtype = np.dtype(dtype)
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    n_layers = values.shape[1]
+
+    bounds = tuple(bounds or (lon_min, lon_max, lat_min, lat_max))
+    ny, nx = shape or (grid_size, grid_size)
+    if temp_shape is None:
+        temp_shape = tuple(round(n * temp_grid_size / grid_size) for n in (ny, nx))
+    nty, ntx = temp_shape
+
+    # Ejes 1D de ambas grillas; las grillas 2D sólo existen por ventana
+    lon_axis = np.linspace(bounds[0], bounds[1], nx)
+    lat_axis = np.linspace(bounds[2], bounds[3], ny)
+    temp_lon_axis = np.linspace(bounds[0], bounds[1], ntx)
+    temp_lat_axis = np.linspace(bounds[2], bounds[3], nty)
+
+    # Halos: filtro final en la grilla de salida; suavizado y spline en la temporal
+    out_halo = _filter_radius(final_sigma)
+    temp_halo = _filter_radius(max(smoothing_sigmas)) + spline_halo
+
+    # El sistema RBF se factoriza una vez para todas las capas y teselas
+    rbf = build_rbf(lon_stations, lat_stations, values, epsilon=0.005, smooth=0.1,
+                    backend=backend, neighbors=neighbors)
+
+    ty, tx = (tile_size, tile_size) if np.isscalar(tile_size) else tile_size
+    chunks = (1, min(ty, ny), min(tx, nx))
+    store, close = open_tiled_store(output_path, (n_layers, ny, nx), chunks,
+                                    dtype=dtype, bounds=bounds)
+    buffers = {}
+    try:
+        for rows, cols in tile_slices((ny, nx), (ty, tx)):
+            # Ventana de salida con halo, recortada al dominio
+            y0, y1 = max(rows.start - out_halo, 0), min(rows.stop + out_halo, ny)
+            x0, x1 = max(cols.start - out_halo, 0), min(cols.stop + out_halo, nx)
+
+            # Ventana correspondiente en la grilla temporal
+            ty0, ty1 = _source_window(y0, y1, ny, nty, temp_halo)
+            tx0, tx1 = _source_window(x0, x1, nx, ntx, temp_halo)
+            temp_lon, temp_lat = np.meshgrid(temp_lon_axis[tx0:tx1], temp_lat_axis[ty0:ty1])
+            z_rbf = np.moveaxis(rbf(temp_lon, temp_lat), -1, 0).astype(dtype, copy=False)
+
+            spline_y = _spline_matrix(nty, ny, bounds[2], bounds[3], dtype, (ty0, ty1), (y0, y1))
+            spline_x = _spline_matrix(ntx, nx, bounds[0], bounds[1], dtype, (tx0, tx1), (x0, x1))
+            if temp_lon.shape not in buffers:
+                buffers[temp_lon.shape] = create_smoothing_buffers(temp_lon.shape, dtype=dtype)
+            window_buffers = buffers[temp_lon.shape]
+
+            inner = (slice(rows.start - y0, rows.stop - y0), slice(cols.start - x0, cols.stop - x0))
+            tile = np.empty((n_layers, rows.stop - rows.start, cols.stop - cols.start), dtype=dtype)
+            for layer in range(n_layers):
+                z_smooth = multiscale_smooth(z_rbf[layer], output=window_buffers['smooth'],
+                                             buffers=window_buffers)
+                z_window = spline_y @ z_smooth @ spline_x.T
+                tile[layer] = gaussian_filter(z_window, sigma=final_sigma)[inner]
+
+            if land_mask:
+                tile_lon, tile_lat = np.meshgrid(lon_axis[cols], lat_axis[rows])
+                tile[:, create_land_mask(tile_lon, tile_lat, use_cache=False)] = np.nan
+
+            store[:, rows, cols] = tile
+    finally:
+        close()
+    return output_path
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('.cache', 'zooplankton', 'diversity_tiles.zarr')
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    depths = [0, 50, 100, 200]
+    lon_stations, lat_stations = create_sampling_stations()
+    values = np.column_stack([generate_diversity_data(depth, lon_stations, lat_stations)
+                              for depth in depths])
+
+    interpolate_tiled(lon_stations, lat_stations, values, output_path,
+                      tile_size=128, land_mask=True)
+    print(f"Capas {depths} escritas en {output_path}")
@@ -9,107 +9,172 @@ Fecha: 20-03-2025
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-import matplotlib.colors as mcolors
-from scipy.interpolate import Rbf
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from matplotlib.patches import Polygon
-import matplotlib.patheffects as PathEffects
+from scipy.interpolate import interp1d, make_interp_spline
 import os
-from matplotlib.ticker import ScalarFormatter
-from scipy import stats
+import hashlib
+import pickle
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from scipy.ndimage import correlate1d, gaussian_filter
 
-# Crear directorio para guardar las imágenes si no existe
+from cache_io import save_npy_atomic, write_bytes_atomic
+from rbf_interpolation import build_rbf
+
+# Directorio donde `main` guarda las imágenes
 save_dir = 'public/images/diversidad/zooplankton'
-os.makedirs(save_dir, exist_ok=True)
+
+# Directorio para resultados intermedios reutilizables entre ejecuciones (máscaras, etc.)
+cache_dir = os.path.join('.cache', 'zooplankton')
 
 # Definir la región de la Bahía de Valparaíso (coordenadas aproximadas)
 lon_min, lon_max = -71.7, -71.45
 lat_min, lat_max = -33.1, -32.9
 
-# Generar una cuadrícula para la interpolación
+# Tamaño de la cuadrícula para la interpolación
 grid_size = 300  # Aumentado de 100 a 300 para mayor resolución
-lon_grid, lat_grid = np.meshgrid(np.linspace(lon_min, lon_max, grid_size),
-                                np.linspace(lat_min, lat_max, grid_size))
+
+# Puntos de la línea de costa (lon, lat), de sur a norte
+COAST_POINTS = [
+    (-71.7, -33.1),      # Punto sur
+    (-71.65, -33.075),   # Punto intermedio sur
+    (-71.62, -33.05),    # Curva bahía sur
+    (-71.6, -33.03),     # Bahía Valparaíso
+    (-71.58, -33.02),    # Puerto Valparaíso
+    (-71.56, -33.0),     # Curva norte Valparaíso
+    (-71.54, -32.97),    # Costa Viña
+    (-71.52, -32.95),    # Viña del Mar
+    (-71.5, -32.93),     # Curva norte Viña
+    (-71.48, -32.91),    # Punto norte
+    (-71.45, -32.9)      # Extremo norte
+]
+
+@lru_cache(maxsize=None)
+def coastline_function():
+    """
+    Devuelve la línea de costa interpolada como una función lon = f(lat).
+    El interpolador se construye una sola vez y se comparte entre llamadas.
+    """
+    coast_x, coast_y = zip(*COAST_POINTS)
+    return interp1d(coast_y, coast_x, kind='cubic', fill_value='extrapolate')
+
+def _land_mask_key(lon_grid, lat_grid):
+    """
+    Clave de la máscara: límites de la región, tamaño de la grilla y puntos de costa.
+    """
+    bounds = (lon_grid[0, 0], lon_grid[0, -1], lat_grid[0, 0], lat_grid[-1, 0])
+    payload = repr((tuple(float(b) for b in bounds), lon_grid.shape, COAST_POINTS))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
 
 # Crear una máscara más precisa para la tierra
-def create_land_mask(lon_grid, lat_grid):
-    """
-    Crea una máscara para la tierra en la Bahía de Valparaíso.
-    Utiliza una aproximación más precisa de la línea de costa.
-    """
-    mask = np.ones_like(lon_grid)
-    
-    # Definir puntos de la línea de costa con más detalle
-    coast_points = [
-        (-71.7, -33.1),      # Punto sur
-        (-71.65, -33.075),   # Punto intermedio sur
-        (-71.62, -33.05),    # Curva bahía sur
-        (-71.6, -33.03),     # Bahía Valparaíso
-        (-71.58, -33.02),    # Puerto Valparaíso
-        (-71.56, -33.0),     # Curva norte Valparaíso
-        (-71.54, -32.97),    # Costa Viña
-        (-71.52, -32.95),    # Viña del Mar
-        (-71.5, -32.93),     # Curva norte Viña
-        (-71.48, -32.91),    # Punto norte
-        (-71.45, -32.9)      # Extremo norte
-    ]
-    
-    # Crear una malla más densa para la máscara
-    x = np.linspace(lon_min, lon_max, grid_size)
-    y = np.linspace(lat_min, lat_max, grid_size)
+def create_land_mask(lon_grid, lat_grid, use_cache=True):
+    """
+    Crea una máscara booleana de la tierra en la Bahía de Valparaíso
+    (True = tierra). La línea de costa se evalúa una sola vez por fila de la
+    grilla y la comparación se hace como una única operación de arreglos.
+
+    La máscara se guarda en `cache_dir` bajo una clave derivada de la región,
+    el tamaño de la grilla y los puntos de costa; las ejecuciones siguientes
+    la abren como memory-map en lugar de reconstruirla.
+    """
+    path = os.path.join(cache_dir, f'land_mask_{_land_mask_key(lon_grid, lat_grid)}.npy')
+    if use_cache and os.path.exists(path):
+        return np.load(path, mmap_mode='r')
     
-    # Interpolar la línea de costa
-    from scipy.interpolate import interp1d
-    coast_x, coast_y = zip(*coast_points)
-    f = interp1d(coast_y, coast_x, kind='cubic', fill_value='extrapolate')
+    # En una grilla de meshgrid la latitud es constante a lo largo de cada fila:
+    # un punto está en tierra si queda a la derecha (este) de la costa
+    f = coastline_function()
+    coast_lon = f(lat_grid[:, 0])
+    mask = lon_grid >= coast_lon[:, np.newaxis]
     
-    # Crear máscara basada en la línea de costa interpolada
-    for i in range(grid_size):
-        for j in range(grid_size):
-            # Si el punto está a la derecha de la línea de costa interpolada
-            # para esa latitud, es tierra
-            coast_lon = f(lat_grid[i,j])
-            if lon_grid[i,j] >= coast_lon:
-                mask[i,j] = np.nan
+    if not use_cache:
+        return mask
     
-    return mask
+    # Escritura atómica para que otro proceso nunca lea una máscara a medias
+    save_npy_atomic(path, mask)
+    return np.load(path, mmap_mode='r')
+
+def apply_land_mask(z_grid, land_mask):
+    """
+    Asigna NaN a las celdas de tierra de `z_grid` (en el mismo arreglo) y lo devuelve.
+    """
+    z_grid[np.asarray(land_mask)] = np.nan
+    return z_grid
+
+class ResultCache:
+    """
+    Caché LRU de resultados con contadores de aciertos y fallos.
+
+    Los arreglos guardados se marcan de sólo lectura, de modo que quien los
+    reciba no pueda alterar el resultado compartido; para modificarlos hay
+    que copiarlos. `maxsize` limita el número de entradas (None = sin límite).
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def get(self, key, compute):
+        """
+        Devuelve el resultado de `key`, calculándolo con `compute()` si no está.
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        
+        self.misses += 1
+        result = compute()
+        for array in (result if isinstance(result, tuple) else (result,)):
+            array.setflags(write=False)
+        self._entries[key] = result
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return result
+    
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'maxsize': self.maxsize, 'currsize': len(self._entries)}
+    
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+# Cachés de estaciones y de datos por (profundidad, conjunto de estaciones, semilla)
+station_cache = ResultCache(maxsize=16)
+diversity_cache = ResultCache(maxsize=256)
+
+def stations_key(lon_stations, lat_stations):
+    """
+    Huella de un conjunto de estaciones (coordenadas en el orden dado).
+    """
+    digest = hashlib.sha1()
+    for coords in (lon_stations, lat_stations):
+        digest.update(np.ascontiguousarray(coords, dtype=float).tobytes())
+    return digest.hexdigest()[:16]
 
 # Crear estaciones de muestreo en transectas
-def create_sampling_stations():
+def create_sampling_stations(n_transects=5, stations_per_transect=8, seed=42):
     """
     Crea estaciones de muestreo en transectas perpendiculares a la costa,
     asegurando que todos los puntos estén en el océano.
+
+    El resultado se guarda en `station_cache`: las llamadas repetidas con los
+    mismos parámetros devuelven los mismos arreglos (de sólo lectura).
     """
-    # Definir puntos de la línea de costa
-    coast_points = [
-        (-71.7, -33.1),      # Punto sur
-        (-71.65, -33.075),   # Punto intermedio sur
-        (-71.62, -33.05),    # Curva bahía sur
-        (-71.6, -33.03),     # Bahía Valparaíso
-        (-71.58, -33.02),    # Puerto Valparaíso
-        (-71.56, -33.0),     # Curva norte Valparaíso
-        (-71.54, -32.97),    # Costa Viña
-        (-71.52, -32.95),    # Viña del Mar
-        (-71.5, -32.93),     # Curva norte Viña
-        (-71.48, -32.91),    # Punto norte
-        (-71.45, -32.9)      # Extremo norte
-    ]
-    
+    key = (n_transects, stations_per_transect, seed)
+    return station_cache.get(key, lambda: _create_sampling_stations(*key))
+
+def _create_sampling_stations(n_transects, stations_per_transect, seed):
     # Interpolar la línea de costa
-    coast_x, coast_y = zip(*coast_points)
-    from scipy.interpolate import interp1d
-    f = interp1d(coast_y, coast_x, kind='cubic', fill_value='extrapolate')
+    f = coastline_function()
     
     # Generar estaciones
     lon_stations = []
     lat_stations = []
     
     # Crear transectas perpendiculares a la costa
-    n_transects = 5  # Número de transectas
-    stations_per_transect = 8  # Estaciones por transecta
     transect_lats = np.linspace(lat_min + 0.02, lat_max - 0.02, n_transects)
     
     for lat in transect_lats:
@@ -121,8 +186,8 @@ def create_sampling_stations():
         station_lats = np.repeat(lat, stations_per_transect)
         
         # Añadir variación aleatoria controlada para evitar alineación perfecta
-        np.random.seed(42)  # Para reproducibilidad
-        station_lats += np.random.normal(0, 0.003, stations_per_transect)
+        rng = np.random.RandomState(seed)  # Para reproducibilidad
+        station_lats += rng.normal(0, 0.003, stations_per_transect)
         
         # Verificar cada punto contra la línea de costa
         for lon, lat_point in zip(station_lons, station_lats):
@@ -134,25 +199,33 @@ def create_sampling_stations():
     return np.array(lon_stations), np.array(lat_stations)
 
 # Generar datos sintéticos de diversidad
-def generate_diversity_data(depth, lon_stations=None, lat_stations=None):
+def generate_diversity_data(depth, lon_stations=None, lat_stations=None, seed=42):
     """
     Genera datos sintéticos de diversidad de zooplancton con patrones
     espaciales heterogéneos y realistas.
+
+    El resultado se guarda en `diversity_cache` con la clave (profundidad,
+    conjunto de estaciones, semilla) y se devuelve como arreglo de sólo lectura.
     """
     # Si no se proporcionan coordenadas, generarlas
     if lon_stations is None or lat_stations is None:
         lon_stations, lat_stations = create_sampling_stations()
     
     # Asegurar que las coordenadas sean arrays numpy
-    lon_stations = np.array(lon_stations)
-    lat_stations = np.array(lat_stations)
+    lon_stations = np.asarray(lon_stations)
+    lat_stations = np.asarray(lat_stations)
     
     # Verificar que las dimensiones coincidan
     if len(lon_stations) != len(lat_stations):
         raise ValueError("Las dimensiones de las coordenadas no coinciden")
     
+    key = (depth, stations_key(lon_stations, lat_stations), seed)
+    return diversity_cache.get(key, lambda: _generate_diversity_data(depth, lon_stations,
+                                                                     lat_stations, seed))
+
+def _generate_diversity_data(depth, lon_stations, lat_stations, seed):
     n_stations = len(lon_stations)
-    np.random.seed(42 + depth)  # Semilla única para cada profundidad
+    rng = np.random.RandomState(seed + depth)  # Semilla única para cada profundidad
     
     # Base de diversidad
     diversity_values = np.zeros(n_stations)
@@ -195,21 +268,148 @@ def generate_diversity_data(depth, lon_stations=None, lat_stations=None):
         diversity_values = 1.5 + deep_pattern + gradient
     
     # Añadir variabilidad aleatoria
-    noise = np.random.normal(0, 0.2, n_stations)
+    noise = rng.normal(0, 0.2, n_stations)
     diversity_values += noise
     
     # Asegurar valores positivos y dentro del rango
     return np.clip(diversity_values, 0.5, 4.0)
 
-# Crear máscara de tierra
-land_mask = create_land_mask(lon_grid, lat_grid)
+# Estado de la región: la grilla y la máscara se construyen la primera vez que se piden
+@lru_cache(maxsize=None)
+def get_grid(size=None):
+    """
+    Devuelve la cuadrícula (lon_grid, lat_grid) de `size` x `size` puntos
+    sobre la región (por defecto `grid_size`). Los arreglos son compartidos
+    entre llamadas y de sólo lectura.
+    """
+    size = size or grid_size
+    lon_grid, lat_grid = np.meshgrid(np.linspace(lon_min, lon_max, size),
+                                     np.linspace(lat_min, lat_max, size))
+    lon_grid.setflags(write=False)
+    lat_grid.setflags(write=False)
+    return lon_grid, lat_grid
+
+@lru_cache(maxsize=None)
+def get_land_mask(size=None):
+    """
+    Devuelve la máscara de tierra de la cuadrícula de `get_grid(size)`.
+    """
+    return create_land_mask(*get_grid(size))
 
-# Función mejorada de interpolación
-def interpolate_data(lon_stations, lat_stations, values, grid_lon, grid_lat):
+# Tamaño de la grilla temporal de alta resolución usada para la interpolación inicial
+temp_grid_size = 500
+
+# Sigma (en celdas de la grilla final) del suavizado final tras el spline
+final_sigma = 0.6
+
+# Escalas (en celdas de la grilla temporal) y pesos del suavizado multi-escala
+smoothing_sigmas = (1.5, 1.0, 0.7)
+smoothing_weights = (0.5, 0.3, 0.2)
+
+@lru_cache(maxsize=None)
+def _gaussian_kernel1d(sigma, weight=1.0, truncate=4.0):
     """
-    Interpola datos puntuales a una malla regular usando una combinación de métodos
-    para crear transiciones ultra suaves sin artefactos.
+    Núcleo gaussiano 1D normalizado (igual al de `gaussian_filter`) multiplicado por `weight`.
+    """
+    radius = int(truncate * sigma + 0.5)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return weight * kernel / kernel.sum()
+
+def create_smoothing_buffers(shape, dtype=float):
+    """
+    Reserva los arreglos de trabajo del suavizado multi-escala para grillas de
+    forma `shape`, para que un lote de capas de profundidad los reutilice.
+    """
+    return {
+        'rows': np.empty(shape, dtype=dtype),
+        'term': np.empty(shape, dtype=dtype),
+        'smooth': np.empty(shape, dtype=dtype),
+    }
+
+def multiscale_smooth(z, output=None, buffers=None):
+    """
+    Suavizado gaussiano multi-escala fusionado: calcula la suma ponderada de
+    filtros gaussianos con `smoothing_sigmas` y `smoothing_weights` y la
+    escribe en `output`.
+
+    La suma de gaussianas 2D no es separable como un único núcleo, pero cada
+    término sí lo es: se aplican núcleos 1D precalculados (con el peso ya
+    incluido) por columnas y por filas sobre buffers reservados una sola vez,
+    acumulando directamente en `output` sin copias intermedias de la grilla.
+    """
+    if buffers is None:
+        buffers = create_smoothing_buffers(z.shape, dtype=z.dtype)
+    if output is None:
+        output = np.empty_like(z)
+    rows, term = buffers['rows'], buffers['term']
+    
+    output.fill(0)
+    for sigma, weight in zip(smoothing_sigmas, smoothing_weights):
+        correlate1d(z, _gaussian_kernel1d(sigma, weight), axis=0, output=rows, mode='reflect')
+        correlate1d(rows, _gaussian_kernel1d(sigma), axis=1, output=term, mode='reflect')
+        output += term
+    return output
+
+@lru_cache(maxsize=None)
+def _temp_grid(grid_density):
+    """
+    Grilla temporal de alta resolución sobre la región (compartida por todas las capas).
+    """
+    temp_lon, temp_lat = np.meshgrid(
+        np.linspace(lon_min, lon_max, grid_density),
+        np.linspace(lat_min, lat_max, grid_density)
+    )
+    temp_lon.setflags(write=False)
+    temp_lat.setflags(write=False)
+    return temp_lon, temp_lat
+
+@lru_cache(maxsize=64)
+def _spline_matrix(n_src, n_dst, x_min, x_max, dtype=np.dtype(np.float64),
+                   src_window=None, dst_window=None):
     """
+    Matriz (n_dst x n_src) que evalúa en `n_dst` puntos equiespaciados el spline
+    cúbico interpolante de `n_src` muestras equiespaciadas en [x_min, x_max].
+
+    El spline bicúbico sobre una grilla regular es el producto tensorial de dos
+    splines 1D, así que con estas matrices la evaluación de una capa se reduce a
+    Wy @ Z @ Wx.T: el sistema del spline se factoriza una sola vez por geometría.
+    La matriz se calcula en float64 y se entrega en `dtype`.
+
+    `src_window` y `dst_window` (inicio, fin) restringen la matriz a un tramo
+    de nodos de cada grilla: el spline se ajusta sólo con las muestras
+    [inicio, fin) de `src_window` y se evalúa en los puntos de `dst_window`
+    (las teselas de `tiled_interpolation`).
+    """
+    x_src = np.linspace(x_min, x_max, n_src)
+    x_dst = np.linspace(x_min, x_max, n_dst)
+    if src_window is not None:
+        x_src = x_src[src_window[0]:src_window[1]]
+    if dst_window is not None:
+        x_dst = x_dst[dst_window[0]:dst_window[1]]
+    matrix = make_interp_spline(x_src, np.eye(len(x_src)), k=3)(x_dst).astype(dtype)
+    # Los pesos lejanos decaen geométricamente: en float32 quedarían como números
+    # subnormales, que hacen muy lento el producto de matrices
+    matrix[np.abs(matrix) < np.finfo(dtype).tiny] = 0
+    matrix.setflags(write=False)
+    return matrix
+
+# Interpolación por lotes de varias capas de profundidad
+def interpolate_layers(lon_stations, lat_stations, values, grid_lon, grid_lat,
+                       backend='rbf', neighbors=None, output=None, buffers=None,
+                       grid_density=None, dtype=None):
+    """
+    Interpola varias capas (p. ej. profundidades) medidas en las mismas
+    estaciones. `values` es una matriz estaciones x capas y el resultado es un
+    cubo capas x ny x nx con la forma de `grid_lon`.
+
+    La geometría de las estaciones y el sistema RBF se factorizan una sola vez
+    (sólo cambia el lado derecho entre capas), y las matrices del spline se
+    reutilizan para todas las capas. El resto de los parámetros son los de
+    `interpolate_data`; `output` debe tener forma capas x ny x nx.
+    """
+    grid_density = grid_density or temp_grid_size  # Aumentar densidad para mejor suavizado
+    dtype = np.dtype(dtype or (output.dtype if output is not None else np.float64))
     try:
         # Convertir a arrays numpy si no lo son
         lon_stations = np.array(lon_stations)
@@ -217,69 +417,100 @@ def interpolate_data(lon_stations, lat_stations, values, grid_lon, grid_lat):
         values = np.array(values)
         
         # Verificar dimensiones
-        if not (len(lon_stations) == len(lat_stations) == len(values)):
+        if values.ndim != 2 or not (len(lon_stations) == len(lat_stations) == len(values)):
             raise ValueError("Dimensiones inconsistentes")
         
-        # Crear grilla de alta resolución para interpolación inicial
-        grid_density = 500  # Aumentar densidad para mejor suavizado
-        temp_lon, temp_lat = np.meshgrid(
-            np.linspace(lon_min, lon_max, grid_density),
-            np.linspace(lat_min, lat_max, grid_density)
-        )
-        
-        # Paso 1: Interpolación RBF inicial
-        rbf = Rbf(lon_stations, lat_stations, values, 
-                 function='multiquadric',
-                 epsilon=0.005,  # Ajustar epsilon para control de suavizado
-                 smooth=0.1)    # Añadir factor de suavizado
-        z_rbf = rbf(temp_lon, temp_lat)
+        n_layers = values.shape[1]
+        ny, nx = grid_lon.shape
+        if output is None:
+            output = np.empty((n_layers, ny, nx), dtype=dtype)
         
-        # Paso 2: Suavizado gaussiano progresivo
-        from scipy.ndimage import gaussian_filter
-        
-        # Aplicar múltiples pasadas de suavizado con diferentes escalas
-        z_smooth = z_rbf.copy()
-        sigmas = [1.5, 1.0, 0.7]  # Diferentes escalas de suavizado
-        weights = [0.5, 0.3, 0.2]  # Pesos para cada escala
-        
-        z_final = np.zeros_like(z_smooth)
-        for sigma, weight in zip(sigmas, weights):
-            z_final += weight * gaussian_filter(z_smooth, sigma=sigma)
-        
-        # Paso 3: Interpolación final usando spline bicúbico
-        from scipy.interpolate import RectBivariateSpline
+        # Crear grilla de alta resolución para interpolación inicial
+        temp_lon, temp_lat = _temp_grid(grid_density)
         
-        # Crear coordenadas para el spline
-        x_temp = np.linspace(lon_min, lon_max, grid_density)
-        y_temp = np.linspace(lat_min, lat_max, grid_density)
+        # Paso 1: Interpolación RBF inicial de todas las capas con un único sistema
+        rbf = build_rbf(lon_stations, lat_stations, values,
+                        epsilon=0.005,  # Ajustar epsilon para control de suavizado
+                        smooth=0.1,     # Añadir factor de suavizado
+                        backend=backend, neighbors=neighbors)
+        # El sistema RBF se resuelve en float64; desde aquí se trabaja en `dtype`
+        z_rbf = np.moveaxis(rbf(temp_lon, temp_lat), -1, 0).astype(dtype, copy=False)
         
-        # Ajustar el spline con parámetros de suavizado
-        spline = RectBivariateSpline(y_temp, x_temp, z_final, 
-                                    s=0.001,  # Factor de suavizado del spline
-                                    kx=3, ky=3)  # Orden del spline
+        # Matrices del spline bicúbico (paso 3), compartidas por todas las capas
+        spline_y = _spline_matrix(grid_density, ny, lat_min, lat_max, dtype)
+        spline_x = _spline_matrix(grid_density, nx, lon_min, lon_max, dtype)
+        spline_rows = np.empty((ny, grid_density), dtype=dtype)
+        z_grid = np.empty((ny, nx), dtype=dtype)
         
-        # Evaluar el spline en la grilla final
-        x_final = np.linspace(lon_min, lon_max, grid_lon.shape[1])
-        y_final = np.linspace(lat_min, lat_max, grid_lon.shape[0])
-        z_grid = spline(y_final, x_final)
+        if buffers is None:
+            buffers = create_smoothing_buffers(temp_lon.shape, dtype=dtype)
         
-        # Paso 4: Suavizado final muy sutil
-        z_grid = gaussian_filter(z_grid, sigma=0.6)
+        for layer in range(n_layers):
+            # Paso 2: Suavizado gaussiano multi-escala en una sola pasada fusionada
+            z_final = multiscale_smooth(z_rbf[layer], output=buffers['smooth'], buffers=buffers)
+            
+            # Paso 3: Interpolación final usando spline bicúbico
+            np.matmul(spline_y, z_final, out=spline_rows)
+            np.matmul(spline_rows, spline_x.T, out=z_grid)
+            
+            # Paso 4: Suavizado final muy sutil
+            gaussian_filter(z_grid, sigma=final_sigma, output=output[layer])
         
-        return z_grid
+        return output
     
     except Exception as e:
         print(f"Error en interpolación: {str(e)}")
         try:
             # Método de respaldo más suave
-            rbf = Rbf(lon_stations, lat_stations, values, 
-                     function='multiquadric', 
-                     epsilon=0.01,
-                     smooth=0.1)
-            return gaussian_filter(rbf(grid_lon, grid_lat), sigma=1.0)
+            rbf = build_rbf(lon_stations, lat_stations, values,
+                            epsilon=0.01,
+                            smooth=0.1,
+                            backend=backend, neighbors=neighbors)
+            z_rbf = np.moveaxis(rbf(grid_lon, grid_lat), -1, 0).astype(dtype, copy=False)
+            return gaussian_filter(z_rbf, sigma=(0, 1.0, 1.0), output=output)
         except:
             print("Error en interpolación de respaldo")
-            return np.full_like(grid_lon, np.nanmean(values))
+            if output is None:
+                return np.full((values.shape[-1],) + grid_lon.shape, np.nanmean(values), dtype=dtype)
+            output.fill(np.nanmean(values))
+            return output
+
+# Función mejorada de interpolación
+def interpolate_data(lon_stations, lat_stations, values, grid_lon, grid_lat,
+                     backend='rbf', neighbors=None, output=None, buffers=None,
+                     grid_density=None, dtype=None):
+    """
+    Interpola datos puntuales a una malla regular usando una combinación de métodos
+    para crear transiciones ultra suaves sin artefactos.
+
+    `backend` y `neighbors` eligen el motor RBF del paso 1 (ver
+    `rbf_interpolation.build_rbf`): 'rbf' es el Rbf denso original y
+    'interpolator' con `neighbors=k` escala a miles de estaciones.
+
+    `output` (forma de `grid_lon`) recibe el resultado y `buffers` (de
+    `create_smoothing_buffers` con forma de la grilla temporal) es la memoria de
+    trabajo del suavizado; pasarlos permite procesar varias capas sin reservar
+    grillas nuevas en cada llamada. Para varias capas en las mismas estaciones
+    es preferible `interpolate_layers`.
+
+    `grid_density` es el tamaño de la grilla temporal (por defecto
+    `temp_grid_size`); para grillas que no caben en memoria ver
+    `tiled_interpolation.interpolate_tiled`.
+
+    `dtype` es el tipo de punto flotante del suavizado, el spline y el
+    resultado (por defecto el de `output`, o float64). El ajuste RBF y las
+    coordenadas siempre se calculan en float64: con epsilon = 0.005 grados las
+    distancias entre estaciones necesitan más de los ~7 dígitos de float32. Con
+    float32 el resultado difiere del de float64 en menos de 1e-5 (H' entre 0.5
+    y 4; ver `benchmark_interpolation.py`), muy por debajo de la resolución de
+    la paleta de colores, y usa la mitad de memoria por capa.
+    """
+    values = np.asarray(values)
+    cube = interpolate_layers(lon_stations, lat_stations, values[:, np.newaxis],
+                              grid_lon, grid_lat, backend=backend, neighbors=neighbors,
+                              output=None if output is None else output[np.newaxis],
+                              buffers=buffers, grid_density=grid_density, dtype=dtype)
+    return cube[0]
 
 # Crear una paleta de colores similar a ODV para índices de diversidad
 def create_odv_cmap():
@@ -287,6 +518,8 @@ def create_odv_cmap():
     Crea una paleta de colores similar a la utilizada en Ocean Data View (ODV)
     para visualizar índices de diversidad.
     """
+    from matplotlib.colors import LinearSegmentedColormap
+    
     # Colores de ODV (azul-turquesa-verde-amarillo-rojo)
     colors = [(0.0, 'darkblue'),
               (0.2, 'blue'),
@@ -299,34 +532,123 @@ def create_odv_cmap():
     cmap = LinearSegmentedColormap.from_list(cmap_name, colors)
     return cmap
 
-# Crear una función para trazar el mapa con la línea de costa de Valparaíso
-def plot_diversity_map(z_grid, depth, vmin=0, vmax=4):
+# Estilo por defecto de las figuras; cada trabajo de renderizado puede sobrescribirlo
+DEFAULT_STYLE = {
+    'dpi': 300,
+    'vmin': 0,
+    'vmax': 4,
+    'diff_vmin': -2,
+    'diff_vmax': 2,
+}
+
+def region_grid(shape):
     """
-    Crea un mapa de la Bahía de Valparaíso mostrando la diversidad interpolada
-    con la línea de costa y una paleta de colores tipo ODV.
+    Devuelve las coordenadas (lon_grid, lat_grid) de una grilla de forma
+    `shape` sobre la región de estudio.
     """
-    # Crear figura con proyección y mayor resolución
-    fig = plt.figure(figsize=(12, 10), dpi=300)
-    ax = plt.axes(projection=ccrs.PlateCarree())
+    return np.meshgrid(np.linspace(lon_min, lon_max, shape[1]),
+                       np.linspace(lat_min, lat_max, shape[0]))
+
+# Mapas base (costa, tierra y océano) ya recortados, por extensión y proyección
+_base_maps = {}
+
+def get_base_map(extent=None, projection='PlateCarree', resolution='10m'):
+    """
+    Devuelve el mapa base de la región: geometrías de Natural Earth (costa,
+    tierra y océano) recortadas a `extent` y proyectadas a `projection`.
+
+    Leer y recortar las capas de 10 m es lo más costoso de cada figura, así
+    que el resultado se guarda en memoria y en `cache_dir` bajo una clave de
+    extensión, proyección y resolución; las figuras siguientes (también en
+    otros procesos de renderizado) sólo dibujan la capa de datos.
+    """
+    extent = tuple(float(v) for v in (extent or (lon_min, lon_max, lat_min, lat_max)))
+    key = hashlib.sha1(repr((extent, projection, resolution)).encode()).hexdigest()[:16]
+    if key in _base_maps:
+        return _base_maps[key]
+    
+    path = os.path.join(cache_dir, f'base_map_{key}.pkl')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            base_map = pickle.load(f)
+    else:
+        import cartopy.crs as ccrs
+        import cartopy.feature as cfeature
+        from shapely.geometry import box
+        from shapely.ops import orient
+        
+        crs = getattr(ccrs, projection)()
+        clip_box = box(extent[0], extent[2], extent[1], extent[3])
+        base_map = {'extent': extent, 'projection': projection}
+        for name in ('coastline', 'land', 'ocean'):
+            feature = cfeature.NaturalEarthFeature('physical', name, resolution)
+            geometries = []
+            for geometry in feature.intersecting_geometries(extent):
+                clipped = geometry.intersection(clip_box)
+                if clipped.is_empty:
+                    continue
+                # GEOS entrega los anillos exteriores en sentido horario; cartopy
+                # los interpretaría como huecos y rellenaría el exterior del polígono
+                if clipped.geom_type in ('Polygon', 'MultiPolygon'):
+                    clipped = orient(clipped, sign=1.0)
+                geometries.append(crs.project_geometry(clipped, ccrs.PlateCarree()))
+            base_map[name] = geometries
+        
+        write_bytes_atomic(path, pickle.dumps(base_map))
+    
+    _base_maps[key] = base_map
+    return base_map
+
+def draw_base_map(ax, base_map, land_zorder=None):
+    """
+    Dibuja un mapa base de `get_base_map` en un eje de cartopy: océano, tierra,
+    línea de costa, extensión y líneas de coordenadas.
+    """
+    import cartopy.crs as ccrs
     
-    # Añadir la costa y características geográficas
-    ax.coastlines(resolution='10m', color='black', linewidth=1)
-    ax.add_feature(cfeature.LAND, facecolor='lightgray', zorder=3)
-    ax.add_feature(cfeature.OCEAN, facecolor='white')
+    crs = getattr(ccrs, base_map['projection'])()
+    
+    # Mismos órdenes de dibujo que ax.coastlines y cfeature.LAND/OCEAN (zorder -1)
+    ax.add_geometries(base_map['coastline'], crs, facecolor='none', edgecolor='black', linewidth=1)
+    ax.add_geometries(base_map['land'], crs, facecolor='lightgray', edgecolor='none',
+                      zorder=-1 if land_zorder is None else land_zorder)
+    ax.add_geometries(base_map['ocean'], crs, facecolor='white', edgecolor='none', zorder=-1)
     
     # Establecer los límites de la región
-    ax.set_extent([lon_min, lon_max, lat_min, lat_max], crs=ccrs.PlateCarree())
+    ax.set_extent(base_map['extent'], crs=ccrs.PlateCarree())
     
     # Añadir coordenadas
     gl = ax.gridlines(draw_labels=True, linewidth=0.5, color='gray', alpha=0.5, linestyle='--')
     gl.top_labels = False
     gl.right_labels = False
+    return gl
+
+# Crear una función para trazar el mapa con la línea de costa de Valparaíso
+def plot_diversity_map(z_grid, depth, vmin=0, vmax=4, stations=None):
+    """
+    Crea un mapa de la Bahía de Valparaíso mostrando la diversidad interpolada
+    con la línea de costa y una paleta de colores tipo ODV.
+
+    `stations` es un par (lon, lat) con las estaciones a dibujar; por defecto
+    se usan las de `create_sampling_stations`.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.patheffects as PathEffects
+    import cartopy.crs as ccrs
+    
+    # Crear figura con proyección y mayor resolución
+    fig = plt.figure(figsize=(12, 10), dpi=300)
+    ax = plt.axes(projection=ccrs.PlateCarree())
+    
+    # Añadir la costa, características geográficas y coordenadas desde la caché
+    draw_base_map(ax, get_base_map(), land_zorder=3)
     
     # Crear colormap ODV
     cmap = create_odv_cmap()
     
     # Plotear los datos interpolados con parámetros optimizados
-    im = ax.pcolormesh(lon_grid, lat_grid, z_grid, 
+    map_lon, map_lat = region_grid(z_grid.shape)
+    im = ax.pcolormesh(map_lon, map_lat, z_grid, 
                       cmap=cmap, 
                       vmin=vmin, vmax=vmax, 
                       transform=ccrs.PlateCarree(),
@@ -336,7 +658,9 @@ def plot_diversity_map(z_grid, depth, vmin=0, vmax=4):
                       zorder=2)
     
     # Añadir las estaciones de muestreo con puntos más pequeños
-    lon_stations, lat_stations = create_sampling_stations()
+    if stations is None:
+        stations = create_sampling_stations()
+    lon_stations, lat_stations = stations
     ax.scatter(lon_stations, lat_stations, c='black', s=20, transform=ccrs.PlateCarree(),
               edgecolor='white', linewidth=0.5, alpha=0.7, marker='o', zorder=4)
     
@@ -363,216 +687,321 @@ def plot_diversity_map(z_grid, depth, vmin=0, vmax=4):
     
     return fig, ax
 
-# Generar y guardar mapas para cada profundidad
-depths = [0, 50, 100, 200]
+# Trabajos de renderizado: funciones puras de (datos, profundidad, estilo) que
+# guardan una figura y devuelven la ruta, para poder enviarlas a otros procesos
+def _merge_style(style):
+    return {**DEFAULT_STYLE, **(style or {})}
+
+def _save_figure(fig, output_file, style):
+    import matplotlib.pyplot as plt
+    fig.savefig(output_file, dpi=style['dpi'], bbox_inches='tight')
+    plt.close(fig)
+    return output_file
+
+def render_diversity_map(z_grid, depth, output_file, stations=None, style=None):
+    """
+    Renderiza y guarda el mapa de diversidad de una profundidad.
+    """
+    style = _merge_style(style)
+    fig, ax = plot_diversity_map(z_grid, depth, vmin=style['vmin'], vmax=style['vmax'],
+                                 stations=stations)
+    return _save_figure(fig, output_file, style)
 
-for depth in depths:
-    # Generar datos de diversidad
-    diversity_values = generate_diversity_data(depth)
+def render_vertical_gradient(diff_grid, output_file, style=None):
+    """
+    Renderiza y guarda el mapa de diferencia de diversidad entre 0m y 200m.
+    """
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
     
-    # Interpolar los valores
-    lon_stations, lat_stations = create_sampling_stations()
-    diversity_grid = interpolate_data(lon_stations, lat_stations, diversity_values, 
-                                    lon_grid, lat_grid)
+    style = _merge_style(style)
     
-    # Aplicar máscara de tierra
-    diversity_grid = diversity_grid * land_mask
+    # Crear figura para la diferencia
+    fig = plt.figure(figsize=(10, 8))
+    ax = plt.axes(projection=ccrs.PlateCarree())
     
-    # Crear y guardar el mapa
-    fig, ax = plot_diversity_map(diversity_grid, depth)
+    # Añadir la costa, características geográficas y coordenadas desde la caché
+    draw_base_map(ax, get_base_map())
     
-    # Guardar figura
-    output_file = os.path.join(save_dir, f'zooplankton_diversity_{depth}m.png')
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close()
+    # Crear un colormap divergente para diferencias
+    diff_cmap = plt.cm.RdBu_r
     
-    print(f"Mapa guardado: {output_file}")
-
-# Generar un mapa que muestre la variación vertical (diferencia entre 0m y 200m)
-diversity_0m = generate_diversity_data(0)
-diversity_200m = generate_diversity_data(200)
-diversity_diff = diversity_0m - diversity_200m
-
-diversity_diff_grid = interpolate_data(lon_stations, lat_stations, diversity_diff, 
-                                    lon_grid, lat_grid)
-diversity_diff_grid = diversity_diff_grid * land_mask
-
-# Crear figura para la diferencia
-fig = plt.figure(figsize=(10, 8))
-ax = plt.axes(projection=ccrs.PlateCarree())
-
-# Añadir la costa y características geográficas
-ax.coastlines(resolution='10m', color='black', linewidth=1)
-ax.add_feature(cfeature.LAND, facecolor='lightgray')
-ax.add_feature(cfeature.OCEAN, facecolor='white')
-
-# Establecer los límites de la región
-ax.set_extent([lon_min, lon_max, lat_min, lat_max], crs=ccrs.PlateCarree())
-
-# Añadir coordenadas
-gl = ax.gridlines(draw_labels=True, linewidth=0.5, color='gray', alpha=0.5, linestyle='--')
-gl.top_labels = False
-gl.right_labels = False
-
-# Crear un colormap divergente para diferencias
-diff_cmap = plt.cm.RdBu_r
+    # Plotear los datos interpolados con el colormap divergente
+    map_lon, map_lat = region_grid(diff_grid.shape)
+    im = ax.pcolormesh(map_lon, map_lat, diff_grid, cmap=diff_cmap, 
+                      vmin=style['diff_vmin'], vmax=style['diff_vmax'],
+                      transform=ccrs.PlateCarree(), shading='auto')
+    
+    # Añadir barra de colores
+    cbar = plt.colorbar(im, ax=ax, shrink=0.8, pad=0.05)
+    cbar.set_label('Diferencia del Índice de Shannon (0m - 200m)', fontsize=12)
+    
+    # Añadir título
+    plt.title('Gradiente Vertical de Diversidad de Zooplancton - Bahía de Valparaíso', fontsize=14)
+    
+    return _save_figure(fig, output_file, style)
 
-# Plotear los datos interpolados con el colormap divergente
-im = ax.pcolormesh(lon_grid, lat_grid, diversity_diff_grid, cmap=diff_cmap, 
-                  vmin=-2, vmax=2, transform=ccrs.PlateCarree(), 
-                  shading='auto')
+def render_vertical_profile(avg_diversity, depths_profile, output_file, style=None):
+    """
+    Renderiza y guarda el perfil vertical promedio de diversidad.
+    """
+    import matplotlib.pyplot as plt
+    
+    style = _merge_style(style)
+    
+    # Crear gráfico de perfil vertical
+    fig, ax = plt.figure(figsize=(7, 10)), plt.axes()
+    ax.plot(avg_diversity, depths_profile, 'o-', linewidth=2, markersize=8, color='#0077b6')
+    ax.set_ylim(210, -10)  # Invertir el eje Y para mostrar 0m arriba
+    ax.set_xlim(0, 4)
+    ax.set_ylabel('Profundidad (m)', fontsize=14)
+    ax.set_xlabel('Índice de Shannon (H\')', fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    plt.title('Perfil Vertical Promedio de Diversidad de Zooplancton', fontsize=16)
+    
+    # Añadir anotaciones sobre las capas principales
+    ax.axhspan(0, 25, alpha=0.1, color='yellow', label='Capa Superficial')
+    ax.text(3.5, 12.5, 'Capa Superficial', fontsize=10, va='center')
+    
+    ax.axhspan(25, 100, alpha=0.1, color='green', label='Capa Intermedia')
+    ax.text(3.5, 62.5, 'Capa Intermedia', fontsize=10, va='center')
+    
+    ax.axhspan(100, 210, alpha=0.1, color='blue', label='Capa Profunda')
+    ax.text(3.5, 155, 'Capa Profunda', fontsize=10, va='center')
+    
+    # Destacar la DCM
+    ax.axhline(y=100, color='red', linestyle='--', alpha=0.5)
+    ax.text(3.5, 100, 'DCM', fontsize=10, va='bottom', color='red')
+    
+    return _save_figure(fig, output_file, style)
 
-# Añadir barra de colores
-cbar = plt.colorbar(im, ax=ax, shrink=0.8, pad=0.05)
-cbar.set_label('Diferencia del Índice de Shannon (0m - 200m)', fontsize=12)
+def render_summary(diversity_by_depth, avg_diversity, depths_profile, distance_to_coast,
+                   output_file, style=None):
+    """
+    Renderiza y guarda el gráfico resumen (promedios, distribución, perfil y
+    relación con la distancia a la costa). `diversity_by_depth` debe contener
+    las profundidades 0, 50, 100 y 200 m.
+    """
+    import matplotlib.pyplot as plt
+    from scipy import stats
+    
+    style = _merge_style(style)
+    depths = [0, 50, 100, 200]
+    
+    fig, axes = plt.subplots(2, 2, figsize=(16, 14))
+    plt.subplots_adjust(wspace=0.3, hspace=0.3)
+    
+    # Definir títulos y colores para cada profundidad
+    depth_titles = ['Superficie (0m)', 'Media agua (50m)', 'DCM (100m)', 'Profundidad (200m)']
+    depth_colors = ['#0077b6', '#00a8e8', '#4361ee', '#023e8a']
+    
+    # Índices promedio para cada profundidad
+    avg_indices = [np.mean(diversity_by_depth[d]) for d in depths]
+    std_indices = [np.std(diversity_by_depth[d]) for d in depths]
+    
+    # Gráfico de barras para diversidad promedio
+    axes[0, 0].bar([0, 1, 2, 3], avg_indices, yerr=std_indices, capsize=10, color=depth_colors, 
+                  alpha=0.7, edgecolor='black', linewidth=1.5)
+    axes[0, 0].set_ylabel('Índice de Shannon Promedio', fontsize=12)
+    axes[0, 0].set_xticks([0, 1, 2, 3])
+    axes[0, 0].set_xticklabels(depth_titles, rotation=45, ha='right')
+    axes[0, 0].set_ylim(0, 4)
+    axes[0, 0].set_title('Diversidad Promedio por Profundidad', fontsize=14)
+    axes[0, 0].grid(axis='y', linestyle='--', alpha=0.7)
+    
+    # Gráfico de caja para distribución de valores
+    box_data = [diversity_by_depth[d] for d in depths]
+    axes[0, 1].boxplot(box_data, patch_artist=True, 
+                      boxprops=dict(facecolor=depth_colors[0], alpha=0.7), 
+                      medianprops=dict(color='darkred'))
+    axes[0, 1].set_ylabel('Índice de Shannon', fontsize=12)
+    axes[0, 1].set_xticklabels(depth_titles)
+    axes[0, 1].set_ylim(0, 4)
+    axes[0, 1].set_title('Distribución de Diversidad por Profundidad', fontsize=14)
+    axes[0, 1].grid(axis='y', linestyle='--', alpha=0.7)
+    
+    # Perfil vertical (reutilizando datos anteriores)
+    axes[1, 0].plot(avg_diversity, depths_profile, 'o-', linewidth=2, markersize=8, color='#0077b6')
+    axes[1, 0].set_ylim(210, -10)  # Invertir el eje Y
+    axes[1, 0].set_xlim(0, 4)
+    axes[1, 0].set_ylabel('Profundidad (m)', fontsize=12)
+    axes[1, 0].set_xlabel('Índice de Shannon (H\')', fontsize=12)
+    axes[1, 0].grid(True, linestyle='--', alpha=0.7)
+    axes[1, 0].set_title('Perfil Vertical de Diversidad', fontsize=14)
+    
+    # Gráfico de correlación entre diversidad y distancia a la costa
+    diversity_0m = diversity_by_depth[0]
+    diversity_200m = diversity_by_depth[200]
+    
+    axes[1, 1].scatter(distance_to_coast, diversity_0m, color=depth_colors[0], 
+                      alpha=0.7, s=80, label='0m')
+    axes[1, 1].scatter(distance_to_coast, diversity_200m, color=depth_colors[3], 
+                      alpha=0.7, s=80, label='200m')
+    
+    # Ajuste lineal para cada conjunto
+    slope0, intercept0, r0, p0, std_err0 = stats.linregress(distance_to_coast, diversity_0m)
+    slope200, intercept200, r200, p200, std_err200 = stats.linregress(distance_to_coast, diversity_200m)
+    
+    x_fit = np.linspace(0, 1, 100)
+    axes[1, 1].plot(x_fit, slope0*x_fit + intercept0, '--', color=depth_colors[0], 
+                   label=f'0m (r={r0:.2f})')
+    axes[1, 1].plot(x_fit, slope200*x_fit + intercept200, '--', color=depth_colors[3], 
+                   label=f'200m (r={r200:.2f})')
+    
+    axes[1, 1].set_xlabel('Distancia Relativa desde la Costa (Oeste a Este)', fontsize=12)
+    axes[1, 1].set_ylabel('Índice de Shannon (H\')', fontsize=12)
+    axes[1, 1].set_title('Diversidad vs. Distancia a la Costa', fontsize=14)
+    axes[1, 1].grid(True, linestyle='--', alpha=0.7)
+    axes[1, 1].legend()
+    
+    # Título general
+    plt.suptitle('Análisis de Diversidad Espacial de Zooplancton - Bahía de Valparaíso', 
+                 fontsize=18, y=0.98)
+    
+    return _save_figure(fig, output_file, style)
+
+def _init_render_worker():
+    """
+    Inicializa un proceso de renderizado forzando el backend no interactivo Agg.
+    """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
 
-# Añadir título
-plt.title('Gradiente Vertical de Diversidad de Zooplancton - Bahía de Valparaíso', fontsize=14)
+def _run_render_job(job):
+    render_function, kwargs = job
+    return render_function(**kwargs)
 
-# Guardar figura
-output_file = os.path.join(save_dir, 'zooplankton_vertical_gradient.png')
-plt.savefig(output_file, dpi=300, bbox_inches='tight')
-plt.close()
+def render_figures(jobs, n_workers=None):
+    """
+    Ejecuta trabajos de renderizado en un pool de procesos y devuelve las rutas
+    guardadas, en el mismo orden que `jobs`.
 
-print(f"Mapa de gradiente vertical guardado: {output_file}")
+    Cada trabajo es un par (función de renderizado, kwargs) con argumentos
+    serializables. `n_workers` es el número de procesos (por defecto uno por
+    CPU, sin superar el número de trabajos); con 1 se renderiza en este proceso.
+    """
+    jobs = list(jobs)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(jobs)))
+    
+    if n_workers == 1:
+        return [_run_render_job(job) for job in jobs]
+    
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_render_worker) as pool:
+        return list(pool.map(_run_render_job, jobs))
 
-# Generar visualización de perfil vertical promedio
+# Profundidades de los mapas y del perfil vertical
+depths = [0, 50, 100, 200]
 depths_profile = [0, 10, 20, 30, 50, 75, 100, 150, 200]
-avg_diversity = []
 
-for d in depths_profile:
-    if d in [0, 50, 100, 200]:
-        div_values = generate_diversity_data(d)
-        avg_diversity.append(np.mean(div_values))
-    else:
-        # Interpolar para profundidades intermedias
-        if d < 50:
-            d0, d1 = 0, 50
-            v0, v1 = np.mean(generate_diversity_data(0)), np.mean(generate_diversity_data(50))
-        elif d < 100:
-            d0, d1 = 50, 100
-            v0, v1 = np.mean(generate_diversity_data(50)), np.mean(generate_diversity_data(100))
+def compute_analysis(dtype='float64'):
+    """
+    Calcula todo lo que muestran las figuras, sin renderizar: estaciones,
+    diversidad por profundidad, capas interpoladas (una por profundidad más
+    la diferencia 0m - 200m, con NaN en tierra), perfil vertical promedio y
+    distancia relativa a la costa. Lo usan `main` y `export_figure_data`.
+    """
+    # Estaciones y datos de diversidad, generados una sola vez para todo el análisis
+    lon_stations, lat_stations = create_sampling_stations()
+    diversity_by_depth = {depth: generate_diversity_data(depth, lon_stations, lat_stations)
+                          for depth in depths}
+    
+    # Interpolar todas las capas (y la diferencia 0m - 200m) en una sola llamada
+    diversity_diff = diversity_by_depth[0] - diversity_by_depth[200]
+    layer_values = np.column_stack([diversity_by_depth[depth] for depth in depths] + [diversity_diff])
+    lon_grid, lat_grid = get_grid()
+    diversity_cube = interpolate_layers(lon_stations, lat_stations, layer_values,
+                                        lon_grid, lat_grid, dtype=dtype)
+    
+    # Aplicar máscara de tierra
+    land_mask = get_land_mask()
+    for layer_grid in diversity_cube:
+        apply_land_mask(layer_grid, land_mask)
+    
+    # Perfil vertical promedio
+    avg_diversity = []
+    mean_by_depth = {depth: np.mean(values) for depth, values in diversity_by_depth.items()}
+    profile_rng = np.random.default_rng(42)  # Variabilidad reproducible del perfil
+    
+    for d in depths_profile:
+        if d in mean_by_depth:
+            avg_diversity.append(mean_by_depth[d])
         else:
-            d0, d1 = 100, 200
-            v0, v1 = np.mean(generate_diversity_data(100)), np.mean(generate_diversity_data(200))
-        
-        # Interpolación lineal
-        weight = (d - d0) / (d1 - d0)
-        interpolated_value = v0 * (1 - weight) + v1 * weight
-        
-        # Añadir variabilidad
-        interpolated_value += np.random.normal(0, 0.05)
-        avg_diversity.append(interpolated_value)
-
-# Crear gráfico de perfil vertical
-fig, ax = plt.figure(figsize=(7, 10)), plt.axes()
-ax.plot(avg_diversity, depths_profile, 'o-', linewidth=2, markersize=8, color='#0077b6')
-ax.set_ylim(210, -10)  # Invertir el eje Y para mostrar 0m arriba
-ax.set_xlim(0, 4)
-ax.set_ylabel('Profundidad (m)', fontsize=14)
-ax.set_xlabel('Índice de Shannon (H\')', fontsize=14)
-ax.grid(True, linestyle='--', alpha=0.7)
-plt.title('Perfil Vertical Promedio de Diversidad de Zooplancton', fontsize=16)
-
-# Añadir anotaciones sobre las capas principales
-ax.axhspan(0, 25, alpha=0.1, color='yellow', label='Capa Superficial')
-ax.text(3.5, 12.5, 'Capa Superficial', fontsize=10, va='center')
-
-ax.axhspan(25, 100, alpha=0.1, color='green', label='Capa Intermedia')
-ax.text(3.5, 62.5, 'Capa Intermedia', fontsize=10, va='center')
-
-ax.axhspan(100, 210, alpha=0.1, color='blue', label='Capa Profunda')
-ax.text(3.5, 155, 'Capa Profunda', fontsize=10, va='center')
-
-# Destacar la DCM
-ax.axhline(y=100, color='red', linestyle='--', alpha=0.5)
-ax.text(3.5, 100, 'DCM', fontsize=10, va='bottom', color='red')
-
-# Guardar perfil vertical
-output_file = os.path.join(save_dir, 'zooplankton_vertical_profile.png')
-plt.savefig(output_file, dpi=300, bbox_inches='tight')
-plt.close()
-
-print(f"Perfil vertical guardado: {output_file}")
-
-# Generar un gráfico resumen
-fig, axes = plt.subplots(2, 2, figsize=(16, 14))
-plt.subplots_adjust(wspace=0.3, hspace=0.3)
-
-# Definir títulos y colores para cada profundidad
-depth_titles = ['Superficie (0m)', 'Media agua (50m)', 'DCM (100m)', 'Profundidad (200m)']
-depth_colors = ['#0077b6', '#00a8e8', '#4361ee', '#023e8a']
-
-# Índices promedio para cada profundidad
-avg_indices = [np.mean(generate_diversity_data(d)) for d in [0, 50, 100, 200]]
-std_indices = [np.std(generate_diversity_data(d)) for d in [0, 50, 100, 200]]
-
-# Gráfico de barras para diversidad promedio
-axes[0, 0].bar([0, 1, 2, 3], avg_indices, yerr=std_indices, capsize=10, color=depth_colors, 
-              alpha=0.7, edgecolor='black', linewidth=1.5)
-axes[0, 0].set_ylabel('Índice de Shannon Promedio', fontsize=12)
-axes[0, 0].set_xticks([0, 1, 2, 3])
-axes[0, 0].set_xticklabels(depth_titles, rotation=45, ha='right')
-axes[0, 0].set_ylim(0, 4)
-axes[0, 0].set_title('Diversidad Promedio por Profundidad', fontsize=14)
-axes[0, 0].grid(axis='y', linestyle='--', alpha=0.7)
-
-# Gráfico de caja para distribución de valores
-box_data = [generate_diversity_data(d) for d in [0, 50, 100, 200]]
-axes[0, 1].boxplot(box_data, patch_artist=True, 
-                  boxprops=dict(facecolor=depth_colors[0], alpha=0.7), 
-                  medianprops=dict(color='darkred'))
-axes[0, 1].set_ylabel('Índice de Shannon', fontsize=12)
-axes[0, 1].set_xticklabels(depth_titles)
-axes[0, 1].set_ylim(0, 4)
-axes[0, 1].set_title('Distribución de Diversidad por Profundidad', fontsize=14)
-axes[0, 1].grid(axis='y', linestyle='--', alpha=0.7)
-
-# Perfil vertical (reutilizando datos anteriores)
-axes[1, 0].plot(avg_diversity, depths_profile, 'o-', linewidth=2, markersize=8, color='#0077b6')
-axes[1, 0].set_ylim(210, -10)  # Invertir el eje Y
-axes[1, 0].set_xlim(0, 4)
-axes[1, 0].set_ylabel('Profundidad (m)', fontsize=12)
-axes[1, 0].set_xlabel('Índice de Shannon (H\')', fontsize=12)
-axes[1, 0].grid(True, linestyle='--', alpha=0.7)
-axes[1, 0].set_title('Perfil Vertical de Diversidad', fontsize=14)
-
-# Gráfico de correlación entre diversidad y distancia a la costa
-lon_stations, lat_stations = create_sampling_stations()
-distance_to_coast = (lon_stations - lon_min) / (lon_max - lon_min)
-diversity_0m = generate_diversity_data(0, lon_stations, lat_stations)
-diversity_200m = generate_diversity_data(200, lon_stations, lat_stations)
-
-axes[1, 1].scatter(distance_to_coast, diversity_0m, color=depth_colors[0], 
-                  alpha=0.7, s=80, label='0m')
-axes[1, 1].scatter(distance_to_coast, diversity_200m, color=depth_colors[3], 
-                  alpha=0.7, s=80, label='200m')
-
-# Ajuste lineal para cada conjunto
-slope0, intercept0, r0, p0, std_err0 = stats.linregress(distance_to_coast, diversity_0m)
-slope200, intercept200, r200, p200, std_err200 = stats.linregress(distance_to_coast, diversity_200m)
-
-x_fit = np.linspace(0, 1, 100)
-axes[1, 1].plot(x_fit, slope0*x_fit + intercept0, '--', color=depth_colors[0], 
-               label=f'0m (r={r0:.2f})')
-axes[1, 1].plot(x_fit, slope200*x_fit + intercept200, '--', color=depth_colors[3], 
-               label=f'200m (r={r200:.2f})')
-
-axes[1, 1].set_xlabel('Distancia Relativa desde la Costa (Oeste a Este)', fontsize=12)
-axes[1, 1].set_ylabel('Índice de Shannon (H\')', fontsize=12)
-axes[1, 1].set_title('Diversidad vs. Distancia a la Costa', fontsize=14)
-axes[1, 1].grid(True, linestyle='--', alpha=0.7)
-axes[1, 1].legend()
-
-# Título general
-plt.suptitle('Análisis de Diversidad Espacial de Zooplancton - Bahía de Valparaíso', 
-             fontsize=18, y=0.98)
-
-# Guardar figura resumen
-output_file = os.path.join(save_dir, 'zooplankton_diversity_summary.png')
-plt.savefig(output_file, dpi=300, bbox_inches='tight')
-plt.close()
-
-print(f"Resumen guardado: {output_file}")
-
-print("¡Análisis espacial de zooplancton completado!") 
\ No newline at end of file
+            # Interpolar para profundidades intermedias
+            if d < 50:
+                d0, d1 = 0, 50
+            elif d < 100:
+                d0, d1 = 50, 100
+            else:
+                d0, d1 = 100, 200
+            v0, v1 = mean_by_depth[d0], mean_by_depth[d1]
+            
+            # Interpolación lineal
+            weight = (d - d0) / (d1 - d0)
+            interpolated_value = v0 * (1 - weight) + v1 * weight
+            
+            # Añadir variabilidad
+            interpolated_value += profile_rng.normal(0, 0.05)
+            avg_diversity.append(interpolated_value)
+    
+    # Distancia relativa a la costa para el gráfico resumen
+    distance_to_coast = (lon_stations - lon_min) / (lon_max - lon_min)
+    
+    return dict(lon_stations=lon_stations, lat_stations=lat_stations,
+                diversity_by_depth=diversity_by_depth, diversity_cube=diversity_cube,
+                avg_diversity=avg_diversity, distance_to_coast=distance_to_coast)
+
+def main(render_workers=None, dtype=None):
+    """
+    Ejecuta el análisis completo: genera las estaciones y los datos por
+    profundidad, interpola todas las capas y renderiza las figuras en
+    `save_dir`. `render_workers` es el número de procesos de renderizado (por
+    defecto la variable de entorno ZOOPLANKTON_RENDER_WORKERS o uno por CPU).
+    `dtype` es el tipo de las grillas interpoladas (por defecto la variable
+    ZOOPLANKTON_DTYPE o float64). Devuelve las rutas de las figuras guardadas.
+    """
+    if render_workers is None:
+        render_workers = int(os.environ.get('ZOOPLANKTON_RENDER_WORKERS', 0)) or None
+    if dtype is None:
+        dtype = os.environ.get('ZOOPLANKTON_DTYPE', 'float64')
+    
+    # Crear directorio para guardar las imágenes si no existe
+    os.makedirs(save_dir, exist_ok=True)
+    
+    analysis = compute_analysis(dtype)
+    lon_stations, lat_stations = analysis['lon_stations'], analysis['lat_stations']
+    diversity_by_depth = analysis['diversity_by_depth']
+    diversity_cube = analysis['diversity_cube']
+    avg_diversity = analysis['avg_diversity']
+    distance_to_coast = analysis['distance_to_coast']
+    
+    # Preparar el mapa base una vez para que los procesos de renderizado lo lean de la caché
+    get_base_map()
+    
+    # Trabajos de renderizado: mapas por profundidad, gradiente, perfil y resumen
+    render_jobs = [
+        (render_diversity_map, dict(z_grid=diversity_grid, depth=depth,
+                                    stations=(lon_stations, lat_stations),
+                                    output_file=os.path.join(save_dir, f'zooplankton_diversity_{depth}m.png')))
+        for depth, diversity_grid in zip(depths, diversity_cube)
+    ]
+    render_jobs += [
+        (render_vertical_gradient, dict(diff_grid=diversity_cube[-1],
+                                        output_file=os.path.join(save_dir, 'zooplankton_vertical_gradient.png'))),
+        (render_vertical_profile, dict(avg_diversity=avg_diversity, depths_profile=depths_profile,
+                                       output_file=os.path.join(save_dir, 'zooplankton_vertical_profile.png'))),
+        (render_summary, dict(diversity_by_depth=diversity_by_depth, avg_diversity=avg_diversity,
+                              depths_profile=depths_profile, distance_to_coast=distance_to_coast,
+                              output_file=os.path.join(save_dir, 'zooplankton_diversity_summary.png'))),
+    ]
+    
+    output_files = render_figures(render_jobs, n_workers=render_workers)
+    for output_file in output_files:
+        print(f"Figura guardada: {output_file}")
+    
+    print("¡Análisis espacial de zooplancton completado!")
+    return output_files
+
+if __name__ == "__main__":
+    main()
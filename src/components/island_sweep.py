@@ -0,0 +1,169 @@
+"""
+Barrido de parámetros de los modelos de islas
+---------------------------------------------
+Evalúa los equilibrios de los cinco modelos de `islandtheory.model_options`
+sobre grillas de distancia x área x S_max (un archipiélago de islas
+virtuales) en una sola operación vectorizada, en lugar de un triple bucle
+con `find_equilibria`.
+
+Para cada bloque de islas la tasa neta I(S) - E(S) se evalúa en una grilla
+relativa de `GRID_POINTS` valores de S entre 0 y el S_max de cada isla (la
+misma resolución que `islandtheory.S_values`), los cambios de signo acotan
+los cruces y todos se refinan a la vez por bisección vectorizada. Igual que
+en `find_equilibria`, los saltos de signo en los umbrales de los modelos no
+lineales cuentan como equilibrios. Los bloques acotan la memoria
+(islas por bloque x `GRID_POINTS`) y pueden repartirse entre procesos.
+
+El resultado es un `xarray.Dataset` con dimensiones (model, dist_factor,
+area_factor, S_max, equilibrium):
+
+- equilibria: S de cada equilibrio en orden creciente (NaN si no hay más),
+- stable: si cada equilibrio es estable,
+- n_equilibria: número de equilibrios,
+- S_eq: equilibrio estable de mayor riqueza (como `main_equilibrium`).
+
+Uso:
+    python src/components/island_sweep.py [salida.nc]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xarray as xr
+
+import islandtheory
+
+MODELS = dict(islandtheory.model_options)
+
+GRID_POINTS = 1000
+MAX_EQUILIBRIA = 4
+# Islas por bloque: bloque x GRID_POINTS valores de la tasa neta en memoria
+CHUNK_SIZE = 4096
+# Pasos de bisección: el intervalo inicial (S_max / GRID_POINTS) se reduce
+# por debajo de 1e-12 especies
+BISECTION_STEPS = 48
+
+def _net_rate(model, S, S_max, dist_factor, area_factor):
+    imm_func, ext_func = MODELS[model]
+    params = dict(S_max=S_max, dist_factor=dist_factor, area_factor=area_factor)
+    return imm_func(S, **params) - ext_func(S, **params)
+
+def sweep_chunk(model, S_max, dist_factor, area_factor,
+                grid_points=GRID_POINTS, max_equilibria=MAX_EQUILIBRIA):
+    """
+    Equilibrios de un bloque de islas (arreglos 1D de parámetros del mismo
+    largo). Devuelve (equilibria, stable, n_equilibria) con forma
+    (islas, max_equilibria), (islas, max_equilibria) e (islas,).
+    """
+    S_max = np.asarray(S_max, dtype=float)
+    dist_factor = np.asarray(dist_factor, dtype=float)
+    area_factor = np.asarray(area_factor, dtype=float)
+    n_islands = len(S_max)
+
+    S = np.linspace(0, 1, grid_points)[None, :] * S_max[:, None]
+    net = _net_rate(model, S, S_max[:, None], dist_factor[:, None], area_factor[:, None])
+    # Un valor exactamente 0 cuenta como I > E: el cruce queda en ese punto
+    positive = net >= 0
+    island, step = np.nonzero(positive[:, :-1] != positive[:, 1:])
+
+    # Bisección vectorizada sobre todos los cruces del bloque
+    low, high = S[island, step], S[island, step + 1]
+    low_positive = positive[island, step]
+    params = (S_max[island], dist_factor[island], area_factor[island])
+    for _ in range(BISECTION_STEPS):
+        mid = (low + high) / 2
+        same = (_net_rate(model, mid, *params) >= 0) == low_positive
+        low = np.where(same, mid, low)
+        high = np.where(same, high, mid)
+
+    # Posición de cada cruce entre los de su isla (ya vienen ordenados por S)
+    n_equilibria = np.bincount(island, minlength=n_islands)
+    rank = np.arange(len(island)) - np.repeat(np.cumsum(n_equilibria) - n_equilibria, n_equilibria)
+    keep = rank < max_equilibria
+
+    equilibria = np.full((n_islands, max_equilibria), np.nan)
+    stable = np.zeros((n_islands, max_equilibria), dtype=bool)
+    equilibria[island[keep], rank[keep]] = ((low + high) / 2)[keep]
+    stable[island[keep], rank[keep]] = low_positive[keep]
+    return equilibria, stable, n_equilibria
+
+def _sweep_task(args):
+    return sweep_chunk(*args)
+
+def sweep(dist_factors, area_factors, S_max_values=(islandtheory.S_max,), models=None,
+          chunk_size=CHUNK_SIZE, workers=None, max_equilibria=MAX_EQUILIBRIA):
+    """
+    Equilibrios de todos los modelos (`models`, por defecto los cinco) para
+    cada combinación de `dist_factors` x `area_factors` x `S_max_values`.
+    Con `workers` > 1 los bloques se reparten en un ProcessPoolExecutor.
+    """
+    models = list(models or MODELS)
+    dist_grid, area_grid, S_max_grid = np.meshgrid(
+        np.asarray(dist_factors, dtype=float), np.asarray(area_factors, dtype=float),
+        np.asarray(S_max_values, dtype=float), indexing='ij')
+    shape = dist_grid.shape
+    dist_flat, area_flat, S_max_flat = dist_grid.ravel(), area_grid.ravel(), S_max_grid.ravel()
+    n_islands = dist_flat.size
+
+    tasks = [(model, S_max_flat[start:start + chunk_size], dist_flat[start:start + chunk_size],
+              area_flat[start:start + chunk_size], GRID_POINTS, max_equilibria)
+             for model in models for start in range(0, n_islands, chunk_size)]
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_sweep_task, tasks))
+    else:
+        results = [_sweep_task(task) for task in tasks]
+
+    chunks_per_model = len(tasks) // len(models)
+    equilibria, stable, counts = [], [], []
+    for m in range(len(models)):
+        parts = results[m * chunks_per_model:(m + 1) * chunks_per_model]
+        equilibria.append(np.concatenate([part[0] for part in parts]).reshape(shape + (max_equilibria,)))
+        stable.append(np.concatenate([part[1] for part in parts]).reshape(shape + (max_equilibria,)))
+        counts.append(np.concatenate([part[2] for part in parts]).reshape(shape))
+    equilibria, stable, counts = np.stack(equilibria), np.stack(stable), np.stack(counts)
+
+    # Equilibrio estable de mayor riqueza, o el último si ninguno es estable
+    main = np.where(stable.any(axis=-1),
+                    np.nanmax(np.where(stable, equilibria, -np.inf), axis=-1, initial=-np.inf),
+                    np.nanmax(np.where(np.isnan(equilibria), -np.inf, equilibria), axis=-1, initial=-np.inf))
+    main[np.isinf(main)] = np.nan
+
+    dims = ('model', 'dist_factor', 'area_factor', 'S_max')
+    return xr.Dataset(
+        {
+            'equilibria': (dims + ('equilibrium',), equilibria),
+            'stable': (dims + ('equilibrium',), stable),
+            'n_equilibria': (dims, counts),
+            'S_eq': (dims, main),
+        },
+        coords={
+            'model': models,
+            'dist_factor': np.asarray(dist_factors, dtype=float),
+            'area_factor': np.asarray(area_factors, dtype=float),
+            'S_max': np.asarray(S_max_values, dtype=float),
+            'equilibrium': np.arange(max_equilibria),
+        })
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('results', 'island_sweep.nc')
+    workers = int(os.environ.get('ISLAND_SWEEP_WORKERS', 0)) or os.cpu_count()
+
+    # Archipiélago de 100 x 100 x 10 = 10⁵ islas virtuales por modelo
+    start = time.perf_counter()
+    result = sweep(np.linspace(0, 5, 100), np.linspace(0, 5, 100), np.linspace(50, 500, 10),
+                   workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"{result.sizes['model']} modelos x {result['S_eq'][0].size} islas en {elapsed:.1f} s")
+
+    # Curva especie-área y especie-aislamiento del modelo clásico con S_max = 100
+    classic = result['S_eq'].sel(model='Modelo Clásico').sel(S_max=100, method='nearest')
+    print(classic.sel(dist_factor=0.5, method='nearest').values[::20].round(1))
+    print(classic.sel(area_factor=2.0, method='nearest').values[::20].round(1))
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    result.to_netcdf(output_path)
+    print(f"Resultados guardados en {output_path}")
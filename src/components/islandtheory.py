@@ -1,10 +1,28 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import RadioButtons
+"""
+Modelos de biogeografía de islas (MacArthur y Wilson) clásico y no lineales.
+
+Las funciones de tasa y `find_equilibria` se pueden importar sin abrir
+ninguna figura (p. ej. desde `island_sweep`); la figura interactiva con
+selector de modelo se construye con `build_figure` al ejecutar el script.
+
+`curve_table` precalcula las curvas y equilibrios de todos los modelos para
+una grilla de parámetros de isla y los guarda en `cache_dir`; la figura y el
+modo sin ventana (`--headless`) sólo leen esa tabla. El modo sin ventana
+exporta la tabla para el sitio web (`export_figure_data`, uint16 con escala
+y un índice JSON) y, con `--images`, una imagen estática por modelo:
 
-# Configuración básica
-fig, ax = plt.subplots(figsize=(12, 8))
-fig.subplots_adjust(left=0.25)
+    python src/components/islandtheory.py --headless [directorio] [--images]
+"""
+
+import hashlib
+import inspect
+import io
+import json
+import os
+import sys
+
+import numpy as np
+from scipy.optimize import brentq
 
 # Parámetros
 S_max = 100  # Máximo de especies en pool continental
@@ -12,68 +30,99 @@ S_values = np.linspace(0, S_max, 1000)
 dist_factor = 0.5
 area_factor = 2.0
 
+# Las funciones de tasa aceptan un escalar o un arreglo de valores de S
+# (np.where / np.maximum en lugar de if / max), así cada curva se evalúa
+# completa en una sola llamada. Todas reciben los mismos parámetros de isla
+# (por defecto los de arriba), que también pueden ser arreglos compatibles
+# con S para evaluar muchas islas a la vez
+
 # Funciones del modelo clásico
-def classic_immigration(S):
-    return max(0, (S_max - S) * np.exp(-dist_factor))
+def classic_immigration(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
+    return np.maximum(0, (S_max - S) * np.exp(-dist_factor))
 
-def classic_extinction(S):
+def classic_extinction(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
     return S * np.exp(-area_factor)
 
 # Funciones con efectos no lineales
-def nonlinear_immigration_founder(S):
+def nonlinear_immigration_founder(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
     # Efecto fundador: tasa reducida para pequeñas S por dificultad de establecimiento
-    if S < 10:
-        return max(0, (S_max - S) * np.exp(-dist_factor) * 0.3)
-    else:
-        return max(0, (S_max - S) * np.exp(-dist_factor))
+    base_rate = np.maximum(0, (S_max - S) * np.exp(-dist_factor))
+    return np.where(S < 10, base_rate * 0.3, base_rate)
 
-def nonlinear_extinction_cascade(S):
+def nonlinear_extinction_cascade(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
     # Extinción en cascada: aumentos abruptos a ciertos umbrales
     base_rate = S * np.exp(-area_factor)
-    if S > 60:
-        return base_rate * 2  # Extinción acelerada por competencia a alta densidad
-    return base_rate
+    # Extinción acelerada por competencia a alta densidad
+    return np.where(S > 60, base_rate * 2, base_rate)
 
-def nonlinear_extinction_allee(S):
+def nonlinear_extinction_allee(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
     # Efecto Allee: extinción muy alta a bajas densidades
     base_rate = S * np.exp(-area_factor)
-    if S < 15:
-        return base_rate * 3 + 1  # Extinción acelerada por efecto Allee
-    return base_rate
+    # Extinción acelerada por efecto Allee
+    return np.where(S < 15, base_rate * 3 + 1, base_rate)
 
-def nonlinear_immigration_facilitation(S):
+def nonlinear_immigration_facilitation(S, S_max=S_max, dist_factor=dist_factor, area_factor=area_factor):
     # Facilitación: algunas especies facilitan el establecimiento de otras
-    base_rate = max(0, (S_max - S) * np.exp(-dist_factor))
-    if 20 < S < 50:
-        return base_rate * 1.5  # Fase de facilitación
-    return base_rate
-
-# Calcular curvas del modelo clásico
-classic_imm = [classic_immigration(s) for s in S_values]
-classic_ext = [classic_extinction(s) for s in S_values]
-
-# Encontrar equilibrio clásico
-classic_eq_idx = np.argmin(np.abs(np.array(classic_imm) - np.array(classic_ext)))
-classic_eq_S = S_values[classic_eq_idx]
-
-# Crear líneas de ploteo
-imm_line, = ax.plot(S_values, classic_imm, 'b-', label='Inmigración')
-ext_line, = ax.plot(S_values, classic_ext, 'r-', label='Extinción')
-eq_point, = ax.plot([classic_eq_S], [classic_imm[classic_eq_idx]], 'ko', markersize=8)
-
-# Configurar gráfico
-ax.set_xlim(0, S_max)
-ax.set_ylim(0, 50)
-ax.set_xlabel('Número de Especies (S)')
-ax.set_ylabel('Tasa')
-ax.set_title('Modelos de Biogeografía de Islas: Clásico vs. No Lineal')
-ax.legend()
-ax.grid(True)
-
-# Líneas de referencia
-eq_vline = ax.axvline(x=classic_eq_S, color='gray', linestyle='--')
-eq_text = ax.text(classic_eq_S + 2, classic_imm[classic_eq_idx] + 1, 
-                  f'Equilibrio: {classic_eq_S:.1f} especies', fontsize=10)
+    base_rate = np.maximum(0, (S_max - S) * np.exp(-dist_factor))
+    # Fase de facilitación
+    return np.where((S > 20) & (S < 50), base_rate * 1.5, base_rate)
+
+def find_equilibria(imm_func, ext_func, S_grid=S_values, **params):
+    """
+    Encuentra todos los cruces de las curvas de inmigración y extinción.
+
+    Los cambios de signo de I(S) - E(S) en `S_grid` acotan cada cruce, que se
+    refina con `brentq` hasta precisión de máquina. En los umbrales de los
+    modelos no lineales las curvas saltan: si el salto cambia el signo, el
+    umbral es también un equilibrio. Devuelve una lista de (S, tasa, estable)
+    en orden creciente de S; un equilibrio es estable si I > E a su izquierda
+    y I < E a su derecha. `params` son los parámetros de la isla.
+    """
+    net = imm_func(S_grid, **params) - ext_func(S_grid, **params)
+    sign = np.sign(net)
+
+    def net_rate(S):
+        return float(imm_func(S, **params) - ext_func(S, **params))
+
+    equilibria = []
+    # Cruces exactamente sobre un punto de la grilla
+    for i in np.flatnonzero(sign == 0):
+        left = sign[i - 1] if i > 0 else -sign[i + 1]
+        right = sign[i + 1] if i + 1 < len(sign) else -left
+        if left != right:
+            equilibria.append((S_grid[i], float(imm_func(S_grid[i], **params)), bool(left > 0)))
+    # Cruces entre dos puntos de la grilla
+    for i in np.flatnonzero(sign[:-1] * sign[1:] < 0):
+        S_eq = brentq(net_rate, S_grid[i], S_grid[i + 1], xtol=1e-12)
+        equilibria.append((S_eq, float(imm_func(S_eq, **params)), bool(sign[i] > 0)))
+    return sorted(equilibria)
+
+def equilibrium_label(equilibria):
+    if not equilibria:
+        return 'Sin equilibrio'
+    if len(equilibria) == 1:
+        return f'Equilibrio: {equilibria[0][0]:.1f} especies'
+    return 'Equilibrios: ' + ', '.join(f'{S:.1f}' for S, _, _ in equilibria) + ' especies'
+
+def main_equilibrium(equilibria):
+    # Equilibrio estable de mayor riqueza (o el último si ninguno es estable)
+    stable = [eq for eq in equilibria if eq[2]]
+    return (stable or equilibria)[-1]
+
+# Directorio para tablas de curvas reutilizables entre ejecuciones
+cache_dir = os.path.join('.cache', 'islandtheory')
+export_dir = os.path.join('public', 'data', 'islandtheory')
+images_dir = os.path.join('public', 'images', 'biology', 'community_ecology', 'islandtheory')
+
+# Grilla exportada: la de los controles deslizantes de
+# `IslandTheoryModel.tsx` (distancia 0.1-2, área 0.1-4, paso 0.1) y S de 2 en 2
+EXPORT_DIST_FACTORS = np.round(np.arange(1, 21) * 0.1, 1)
+EXPORT_AREA_FACTORS = np.round(np.arange(1, 41) * 0.1, 1)
+EXPORT_S_POINTS = 51
+MAX_EQUILIBRIA = 4
+
+# Cambiar al modificar el contenido de la tabla: invalida la caché
+TABLE_VERSION = 2
 
 # Opciones de modelos
 model_options = [
@@ -84,18 +133,6 @@ model_options = [
     ('Facilitación', (nonlinear_immigration_facilitation, classic_extinction))
 ]
 
-# Botones de radio para seleccionar modelo
-rax = plt.axes([0.05, 0.5, 0.15, 0.3])
-radio = RadioButtons(rax, [opt[0] for opt in model_options])
-
-# Descripción del modelo actual
-desc_ax = plt.axes([0.05, 0.1, 0.15, 0.3])
-desc_ax.axis('off')
-model_desc = desc_ax.text(0, 0.9, 
-                        "Modelo Clásico:\nPropuesto por MacArthur\ny Wilson (1967).\nPredice equilibrio\nbasado en balance\nentre inmigración\ny extinción.", 
-                        fontsize=9, 
-                        verticalalignment='top')
-
 # Descripciones de modelos
 model_descriptions = {
     'Modelo Clásico': "Modelo Clásico:\nPropuesto por MacArthur\ny Wilson (1967).\nPredice equilibrio\nbasado en balance\nentre inmigración\ny extinción.",
@@ -105,37 +142,243 @@ model_descriptions = {
     'Facilitación': "Facilitación:\nAlgunas especies mejoran\nlas condiciones para otras,\nacelerando la inmigración\nen fases intermedias\nde colonización."
 }
 
-# Función de actualización al cambiar modelo
-def update_model(label):
-    # Obtener funciones del modelo seleccionado
-    for name, funcs in model_options:
-        if name == label:
-            imm_func, ext_func = funcs
-            break
-    
-    # Actualizar curvas
-    imm_values = [imm_func(s) for s in S_values]
-    ext_values = [ext_func(s) for s in S_values]
-    
-    imm_line.set_ydata(imm_values)
-    ext_line.set_ydata(ext_values)
-    
-    # Encontrar nuevo equilibrio
-    eq_idx = np.argmin(np.abs(np.array(imm_values) - np.array(ext_values)))
-    eq_S = S_values[eq_idx]
-    
-    # Actualizar punto y líneas de equilibrio
-    eq_point.set_data([eq_S], [imm_values[eq_idx]])
-    eq_vline.set_xdata([eq_S, eq_S])
-    eq_text.set_position((eq_S + 2, imm_values[eq_idx] + 1))
-    eq_text.set_text(f'Equilibrio: {eq_S:.1f} especies')
-    
-    # Actualizar descripción
-    model_desc.set_text(model_descriptions[label])
-    
-    fig.canvas.draw_idle()
-
-# Conectar radio buttons a función de actualización
-radio.on_clicked(update_model)
-
-plt.show()
\ No newline at end of file
+def _table_key(dist_factors, area_factors, S_grid, S_max):
+    # El código de las funciones de tasa entra en la clave: editar un umbral
+    # o un multiplicador invalida la tabla guardada
+    digest = hashlib.sha1(repr((TABLE_VERSION, S_max, MAX_EQUILIBRIA,
+                                [name for name, _ in model_options])).encode())
+    for _, functions in model_options:
+        for function in functions:
+            digest.update(inspect.getsource(function).encode())
+    for array in (dist_factors, area_factors, S_grid):
+        digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+    return digest.hexdigest()[:16]
+
+def curve_table(dist_factors=(dist_factor,), area_factors=(area_factor,), S_grid=S_values,
+                S_max=S_max, use_cache=True):
+    """
+    Curvas y equilibrios de todos los modelos para cada combinación de
+    `dist_factors` x `area_factors`. Devuelve un dict con
+    'immigration' y 'extinction' (modelos x distancia x área x S) y
+    'equilibria' (modelos x distancia x área x MAX_EQUILIBRIA x 3: S, tasa y
+    estable, NaN si no hay más). Con `use_cache` la tabla se guarda en
+    `cache_dir` con una clave de los parámetros.
+    """
+    dist_factors = np.asarray(dist_factors, dtype=float)
+    area_factors = np.asarray(area_factors, dtype=float)
+    S_grid = np.asarray(S_grid, dtype=float)
+    path = os.path.join(cache_dir, f'{_table_key(dist_factors, area_factors, S_grid, S_max)}.npz')
+    if use_cache and os.path.exists(path):
+        with np.load(path) as cached:
+            return dict(cached)
+
+    # Los equilibrios salen del mismo motor vectorizado que el barrido de
+    # parámetros (importado aquí: island_sweep importa este módulo)
+    from island_sweep import sweep_chunk
+
+    shape = (len(model_options), len(dist_factors), len(area_factors))
+    immigration = np.empty(shape + (len(S_grid),))
+    extinction = np.empty(shape + (len(S_grid),))
+    equilibria = np.full(shape + (MAX_EQUILIBRIA, 3), np.nan)
+    dist_grid, area_grid = np.meshgrid(dist_factors, area_factors, indexing='ij')
+    S_max_flat = np.full(dist_grid.size, float(S_max))
+    for m, (name, (imm_func, ext_func)) in enumerate(model_options):
+        # Curvas de todas las islas en una sola evaluación vectorizada
+        params = dict(S_max=S_max, dist_factor=dist_grid[..., None], area_factor=area_grid[..., None])
+        immigration[m] = imm_func(S_grid, **params)
+        extinction[m] = ext_func(S_grid, **params)
+
+        # Equilibrios de todas las islas a la vez, buscados siempre en la
+        # grilla fina de S (como `find_equilibria`), aunque las curvas se
+        # guarden en otra
+        S_eq, stable, _ = sweep_chunk(name, S_max_flat, dist_grid.ravel(), area_grid.ravel(),
+                                      grid_points=len(S_values), max_equilibria=MAX_EQUILIBRIA)
+        # Tasa en el equilibrio: mediana de ambas curvas justo a cada lado.
+        # En un cruce normal coinciden; en un salto de umbral queda sobre la
+        # curva continua, donde ésta corta el salto
+        island = dict(S_max=S_max, dist_factor=dist_grid.reshape(-1, 1),
+                      area_factor=area_grid.reshape(-1, 1))
+        side = 1e-9 * S_max
+        rate = np.median([func(S_eq + offset, **island) for func in (imm_func, ext_func)
+                          for offset in (-side, side)], axis=0)
+        found = ~np.isnan(S_eq)
+        equilibria[m, ..., 0] = S_eq.reshape(shape[1:] + (MAX_EQUILIBRIA,))
+        equilibria[m, ..., 1] = np.where(found, rate, np.nan).reshape(shape[1:] + (MAX_EQUILIBRIA,))
+        equilibria[m, ..., 2] = np.where(found, stable, np.nan).reshape(shape[1:] + (MAX_EQUILIBRIA,))
+
+    table = dict(dist_factors=dist_factors, area_factors=area_factors, S=S_grid,
+                 immigration=immigration, extinction=extinction, equilibria=equilibria)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, **table)
+        _write_atomic(path, buffer.getvalue())
+    return table
+
+def _equilibrium_list(values):
+    # Fila MAX_EQUILIBRIA x 3 de la tabla -> [(S, tasa, estable), ...]
+    return [(float(S), float(rate), bool(stable)) for S, rate, stable in values if not np.isnan(S)]
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def export_figure_data(output_dir=export_dir, dist_factors=EXPORT_DIST_FACTORS,
+                       area_factors=EXPORT_AREA_FACTORS, S_points=EXPORT_S_POINTS):
+    """
+    Exporta las curvas de `curve_table` para el sitio web:
+
+    - curves.bin: uint16 little-endian con forma (modelo, distancia, área,
+      curva, S), curva 0 = inmigración y 1 = extinción; tasa = valor x scale,
+    - index.json: modelos y descripciones, grillas de parámetros y de S,
+      forma, escala y equilibrios [S, tasa, estable] de cada isla.
+
+    Devuelve la ruta del índice.
+    """
+    table = curve_table(dist_factors, area_factors, np.linspace(0, S_max, S_points))
+    curves = np.stack([table['immigration'], table['extinction']], axis=3)
+    scale = max(float(curves.max()), 1e-12) / np.iinfo(np.uint16).max
+    quantized = np.round(curves / scale).astype('<u2')
+
+    n_models, n_dist, n_area = curves.shape[:3]
+    equilibria = [[[[[round(S, 3), round(rate, 3), stable]
+                     for S, rate, stable in _equilibrium_list(table['equilibria'][m, i, j])]
+                    for j in range(n_area)] for i in range(n_dist)] for m in range(n_models)]
+    index = {
+        'models': [name for name, _ in model_options],
+        'descriptions': model_descriptions,
+        'dist_factors': table['dist_factors'].round(6).tolist(),
+        'area_factors': table['area_factors'].round(6).tolist(),
+        'S': table['S'].round(6).tolist(),
+        'curves': {'file': 'curves.bin', 'dtype': 'uint16', 'shape': list(quantized.shape),
+                   'order': ['model', 'dist_factor', 'area_factor', 'curve', 'S'],
+                   'curve': ['immigration', 'extinction'], 'scale': scale, 'offset': 0.0},
+        'equilibria': equilibria,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    _write_atomic(os.path.join(output_dir, 'curves.bin'), quantized.tobytes())
+    index_path = os.path.join(output_dir, 'index.json')
+    _write_atomic(index_path, json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return index_path
+
+def export_images(output_dir=images_dir, dpi=100):
+    """
+    Guarda una imagen estática de la figura para cada modelo con los
+    parámetros por defecto. Devuelve las rutas.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, radio = build_figure()
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, (name, _) in enumerate(model_options):
+        radio.set_active(i)
+        slug = name.lower().translate(str.maketrans('áéíóú ', 'aeiou_'))
+        path = os.path.join(output_dir, f'{slug}.png')
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+def build_figure():
+    """
+    Figura interactiva con las curvas del modelo elegido en los botones de
+    radio. Devuelve (fig, radio); hay que conservar `radio` para que el
+    selector siga respondiendo.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import RadioButtons
+
+    # Configuración básica
+    fig, ax = plt.subplots(figsize=(12, 8))
+    fig.subplots_adjust(left=0.25)
+
+    # Curvas y equilibrios de todos los modelos, calculados una sola vez
+    table = curve_table()
+    model_index = {name: m for m, (name, _) in enumerate(model_options)}
+
+    # Curvas del modelo clásico
+    classic_imm = table['immigration'][0, 0, 0]
+    classic_ext = table['extinction'][0, 0, 0]
+    classic_equilibria = _equilibrium_list(table['equilibria'][0, 0, 0])
+    classic_eq_S, classic_eq_rate, _ = main_equilibrium(classic_equilibria)
+
+    # Crear líneas de ploteo
+    imm_line, = ax.plot(S_values, classic_imm, 'b-', label='Inmigración')
+    ext_line, = ax.plot(S_values, classic_ext, 'r-', label='Extinción')
+    eq_point, = ax.plot([S for S, _, _ in classic_equilibria],
+                        [rate for _, rate, _ in classic_equilibria], 'ko', markersize=8)
+
+    # Configurar gráfico
+    ax.set_xlim(0, S_max)
+    ax.set_ylim(0, 50)
+    ax.set_xlabel('Número de Especies (S)')
+    ax.set_ylabel('Tasa')
+    ax.set_title('Modelos de Biogeografía de Islas: Clásico vs. No Lineal')
+    ax.legend()
+    ax.grid(True)
+
+    # Líneas de referencia
+    eq_vline = ax.axvline(x=classic_eq_S, color='gray', linestyle='--')
+    eq_text = ax.text(classic_eq_S + 2, classic_eq_rate + 1, 
+                      equilibrium_label(classic_equilibria), fontsize=10)
+
+    # Botones de radio para seleccionar modelo
+    rax = plt.axes([0.05, 0.5, 0.15, 0.3])
+    radio = RadioButtons(rax, [opt[0] for opt in model_options])
+
+    # Descripción del modelo actual
+    desc_ax = plt.axes([0.05, 0.1, 0.15, 0.3])
+    desc_ax.axis('off')
+    model_desc = desc_ax.text(0, 0.9, model_descriptions['Modelo Clásico'],
+                              fontsize=9, 
+                              verticalalignment='top')
+
+    # Función de actualización al cambiar modelo
+    def update_model(label):
+        # Curvas precalculadas del modelo seleccionado
+        m = model_index[label]
+        
+        # Actualizar curvas
+        imm_line.set_ydata(table['immigration'][m, 0, 0])
+        ext_line.set_ydata(table['extinction'][m, 0, 0])
+        
+        # Equilibrios precalculados
+        equilibria = _equilibrium_list(table['equilibria'][m, 0, 0])
+        
+        # Actualizar puntos y líneas de equilibrio
+        eq_point.set_data([S for S, _, _ in equilibria], [rate for _, rate, _ in equilibria])
+        if equilibria:
+            eq_S, eq_rate, _ = main_equilibrium(equilibria)
+            eq_vline.set_xdata([eq_S, eq_S])
+            eq_text.set_position((eq_S + 2, eq_rate + 1))
+        eq_text.set_text(equilibrium_label(equilibria))
+        
+        # Actualizar descripción
+        model_desc.set_text(model_descriptions[label])
+        
+        fig.canvas.draw_idle()
+
+    # Conectar radio buttons a función de actualización
+    radio.on_clicked(update_model)
+    return fig, radio
+
+if __name__ == "__main__":
+    if '--headless' in sys.argv:
+        # Sin ventana: exportar datos (e imágenes) para el sitio web
+        import matplotlib
+        matplotlib.use('Agg')
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        index_path = export_figure_data(*args[:1])
+        print(f"Datos de las curvas exportados en {index_path}")
+        if '--images' in sys.argv:
+            for path in export_images():
+                print(f"Imagen guardada en {path}")
+    else:
+        import matplotlib.pyplot as plt
+
+        fig, radio = build_figure()
+        plt.show()
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy.spatial.distance import pdist
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import beta_diversity  # noqa: E402
+import dissimilarity  # noqa: E402
+
+
+@pytest.fixture
+def presence():
+    rng = np.random.default_rng(3)
+    presence = rng.random((8, 70)) < 0.3
+    # Dos sitios vacíos (par vacío-vacío) y uno vacío frente a los demás
+    presence[[2, 5]] = False
+    return presence
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_beta_indices_match_pdist(presence, packed):
+    data = beta_diversity.PresenceMatrix.from_dense(presence) if packed else presence
+    indices = beta_diversity.beta_indices(data)
+    expected = {name: np.nan_to_num(pdist(presence, metric), nan=0.0)
+                for name, metric in (('jaccard', 'jaccard'), ('sorensen', 'dice'))}
+    for name, values in expected.items():
+        assert np.allclose(indices[name], values)
+    # Whittaker (b + c) / ((a + b) / 2) es el doble de Sørensen
+    assert np.allclose(indices['whittaker'], 2 * expected['sorensen'])
+
+
+def test_empty_pair_is_zero_everywhere(presence):
+    empty_pair = beta_diversity.pair_labels(range(len(presence))).index('2-5')
+    indices = beta_diversity.beta_indices(presence)
+    assert all(values[empty_pair] == 0 for values in indices.values())
+    assert beta_diversity.similarities(indices)['jaccard'][empty_pair] == 1
+    for metric in dissimilarity.METRICS:
+        for chunk_size in (None, 3):
+            values = dissimilarity.compute_dissimilarity(presence, metric, chunk_size=chunk_size)
+            assert values[empty_pair] == 0
+            if metric != 'braycurtis':
+                assert np.allclose(values, indices[metric])
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import cache_io  # noqa: E402
+
+
+def test_save_npy_atomic_creates_directory(tmp_path):
+    path = str(tmp_path / 'cache' / 'values.npy')
+    cache_io.save_npy_atomic(path, np.arange(5))
+    assert np.array_equal(np.load(path), np.arange(5))
+    assert os.listdir(tmp_path / 'cache') == ['values.npy']
+
+
+def test_open_npy_atomic_keeps_previous_file_on_error(tmp_path):
+    path = str(tmp_path / 'matrix.npy')
+    with cache_io.open_npy_atomic(path, np.float32, (3, 3)) as out:
+        out[:] = 1
+    with pytest.raises(RuntimeError):
+        with cache_io.open_npy_atomic(path, np.float32, (3, 3)) as out:
+            out[0] = 2
+            raise RuntimeError
+    assert np.all(np.load(path) == 1)
+    assert os.listdir(tmp_path) == ['matrix.npy']
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import columnar_storage  # noqa: E402
+
+
+@pytest.fixture
+def abundance_csv(tmp_path):
+    # Profundidad fraccionaria y códigos de estación con aspecto numérico
+    table = pd.DataFrame({
+        'station': ['001', '001', '002', '002', '010', '010'],
+        'depth': [0, 12.5, 0, 12.5, 100, 50],
+        'lat': [-33.0, -33.0, -33.1, -33.1, -33.2, -33.2],
+        'lon': [-71.6, -71.6, -71.5, -71.5, -71.4, -71.4],
+        'Acartia tonsa': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'Calanus chilensis': [0.0, 1.0, 0.0, 1.0, 0.0, 1.0],
+    })
+    path = tmp_path / 'abundance.csv'
+    table.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('partitioning', [('depth',), ('depth', 'station')])
+def test_partition_types(abundance_csv, tmp_path, partitioning):
+    root = columnar_storage.convert_csv(abundance_csv, str(tmp_path / 'dataset'),
+                                        partitioning=partitioning)
+
+    depths = columnar_storage.partition_values(root, 'depth')
+    assert depths == [0, 12.5, 50, 100]
+    assert all(isinstance(depth, float) for depth in depths)
+
+    table = columnar_storage.read_table(root, depths=[12.5])
+    assert sorted(table['Acartia tonsa']) == [2.0, 4.0]
+
+    table = columnar_storage.read_table(root, stations=['001', '010'])
+    assert set(table['station']) == {'001', '010'}
+    assert len(table) == 4
+
+
+def test_depth_batches_in_order(abundance_csv, tmp_path):
+    root = columnar_storage.convert_abundance_csv(abundance_csv, str(tmp_path / 'dataset'))
+    batches = list(columnar_storage.iter_depth_batches(root))
+    assert [batch.key for batch in batches] == [0, 12.5, 50, 100]
+    assert np.all(batches[1].depth == np.float32(12.5))
+    assert list(batches[0].station) == ['001', '002']
@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import export_figure_data  # noqa: E402
+
+MANIFEST = os.path.join(os.path.dirname(__file__), '..', export_figure_data.output_dir,
+                        export_figure_data.manifest_name)
+
+
+def test_sources_follow_imports():
+    sources = {os.path.basename(path) for path in
+               export_figure_data.EXPORTS['phylogenetic_diversity'][0]}
+    # abundance_io importa beta_diversity (también dentro de funciones)
+    assert {'phylogenetic_diversity_workflow.py', 'phylo_indices.py', 'abundance_io.py',
+            'beta_diversity.py', 'cache_io.py'} <= sources
+
+
+@pytest.mark.parametrize('group', sorted(export_figure_data.EXPORTS))
+def test_committed_manifest_is_current(group):
+    # Si falla, volver a exportar: python scripts/export_figure_data.py
+    with open(MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    sources, _ = export_figure_data.EXPORTS[group]
+    assert manifest['groups'][group]['key'] == export_figure_data.input_key(group, sources)
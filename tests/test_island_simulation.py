@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'components'))
+
+import island_simulation  # noqa: E402
+
+
+def test_empty_start_is_not_an_extinction():
+    # Desde S0 = 0 las islas que siguen vacías tras el primer paso no se
+    # extinguieron: no deben registrarse en t = dt
+    _, extinction_time = island_simulation.simulate_chunk(
+        'Efecto Allee', 2000, seed=1, S0=0, t_max=2.0, dist_factor=4.6, area_factor=4.0)
+    assert not np.any(extinction_time <= island_simulation.DT)
+    # Las que sí se vacían lo hacen después de haber tenido alguna especie
+    assert np.any(~np.isnan(extinction_time))
+
+
+def test_colonized_start_records_extinctions():
+    richness, extinction_time = island_simulation.simulate_chunk(
+        'Efecto Allee', 2000, seed=1, S0=5, t_max=5.0, dist_factor=4.6, area_factor=4.0)
+    reached = ~np.isnan(extinction_time)
+    assert reached.any()
+    assert richness[0].min() == 5
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from Bio import Phylo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import phylo_indices  # noqa: E402
+
+# Árbol sintético (aproximación taxonómica, ramas en millones de años): sólo
+# entrada de pruebas, no la filogenia del proyecto
+TREE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'zooplankton_tree_synthetic.nwk')
+
+
+@pytest.fixture(scope='module')
+def trees():
+    return Phylo.read(TREE_PATH, 'newick'), phylo_indices.FlatTree.read(TREE_PATH)
+
+
+@pytest.fixture(scope='module')
+def samples(trees):
+    tree, _ = trees
+    species = [tip.name.replace('_', ' ') for tip in tree.get_terminals()]
+    rng = np.random.default_rng(0)
+    abundances = rng.gamma(1.0, 2.0, (20, len(species))) * (rng.random((20, len(species))) < 0.6)
+    return species, abundances.astype(np.float32)
+
+
+def test_faith_pd_matches_tree_walk(trees, samples):
+    tree, flat = trees
+    species, abundances = samples
+    tips = {tip.name.replace('_', ' '): tip for tip in tree.get_terminals()}
+    expected = []
+    for row in abundances:
+        clades = {id(clade): clade for name, value in zip(species, row) if value > 0
+                  for clade in tree.get_path(tips[name])}
+        expected.append(sum(clade.branch_length for clade in clades.values()))
+    assert np.allclose(phylo_indices.faith_pd(abundances, flat, species), expected)
+
+
+def test_rao_q_matches_pairwise_distances(trees, samples):
+    tree, flat = trees
+    species, abundances = samples
+    tips = {tip.name.replace('_', ' '): tip for tip in tree.get_terminals()}
+    distances = np.array([[tree.distance(tips[a], tips[b]) for b in species] for a in species])
+    p = abundances / abundances.sum(axis=1, keepdims=True)
+    expected = np.einsum('si,ij,sj->s', p, distances, p)
+    assert np.allclose(phylo_indices.rao_q(abundances, flat, species), expected, rtol=1e-5)
+    assert np.allclose(phylo_indices.rao_q(abundances, flat, species,
+                                           distances=flat.cophenetic_matrix()), expected, rtol=1e-5)
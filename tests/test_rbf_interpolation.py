@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import zooplankton_spatial_analysis as zsa  # noqa: E402
+from rbf_interpolation import build_rbf  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def layers():
+    lon, lat = zsa.create_sampling_stations()
+    values = np.column_stack([zsa.generate_diversity_data(depth, lon, lat)
+                              for depth in (0, 50, 100, 200)])
+    grid_lon, grid_lat = np.meshgrid(np.linspace(zsa.lon_min, zsa.lon_max, 120),
+                                     np.linspace(zsa.lat_min, zsa.lat_max, 120))
+    return lon, lat, values, grid_lon, grid_lat
+
+
+def test_interpolator_matches_rbf(layers):
+    lon, lat, values, grid_lon, grid_lat = layers
+    dense = build_rbf(lon, lat, values)(grid_lon, grid_lat)
+    interpolated = build_rbf(lon, lat, values, backend='interpolator')(grid_lon, grid_lat)
+    assert np.allclose(dense, interpolated)
+
+
+@pytest.mark.parametrize('neighbors', [5, 10, 20])
+def test_local_mode_stays_in_data_range(layers, neighbors):
+    lon, lat, values, grid_lon, grid_lat = layers
+    surface = build_rbf(lon, lat, values, backend='interpolator',
+                        neighbors=neighbors)(grid_lon, grid_lat)
+    # Margen para la extrapolación hacia las esquinas de la grilla; sin el
+    # término constante los máximos llegaban a 2-7 veces el rango
+    spread = values.max(axis=0) - values.min(axis=0)
+    assert np.all(surface.max(axis=(0, 1)) <= values.max(axis=0) + 0.25 * spread)
+    assert np.all(surface.min(axis=(0, 1)) >= values.min(axis=0) - 0.25 * spread)